@@ -0,0 +1,165 @@
+import math
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from mc_engine import CHUNK_ELEMENTS, TASKS_PER_WORKER, SimulationCancelled, default_workers, make_rng, process_pool
+from risk_summary import VAR_LEVELS
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class BacktestResult(namedtuple("BacktestResult", ["dates", "prices", "realized", "bands", "levels", "horizon", "steps"])):
+    """Forecast origins and their outcomes.
+
+    dates and prices are the origins, realized the price horizon trading days
+    later, steps the daily tab's simulation steps to that date, and bands the
+    simulated price quantile at each level, shape (origins, levels).
+    """
+
+    @property
+    def nbytes(self):
+        return self.prices.nbytes + self.realized.nbytes + self.bands.nbytes + self.dates.nbytes + self.steps.nbytes
+
+
+def rolling_stats(log_returns, window):
+    """Drift (mean - variance / 2) and stdev of every window of consecutive log returns.
+
+    Entry i covers log_returns[i - window + 1 : i + 1] and is NaN for i < window - 1.
+    Running sums of the returns and their squares give each window from the
+    previous one in O(1), instead of recomputing it at every origin.
+    """
+    returns = np.asarray(log_returns, dtype=float)
+    # Centre first so the sums of squares do not cancel catastrophically
+    centred = returns - returns.mean()
+    sums = np.concatenate([[0.0], np.cumsum(centred)])
+    squares = np.concatenate([[0.0], np.cumsum(centred ** 2)])
+    drift = np.full(len(returns), np.nan)
+    stdev = np.full(len(returns), np.nan)
+    if len(returns) < window:
+        return drift, stdev
+    total = sums[window:] - sums[:-window]
+    mean = total / window
+    variance = np.maximum((squares[window:] - squares[:-window] - total * mean) / (window - 1), 0)
+    drift[window - 1:] = mean + returns.mean() - variance / 2
+    stdev[window - 1:] = np.sqrt(variance)
+    return drift, stdev
+
+
+def _origin_quantiles(drift, stdev, increments, iterations, levels, seed, chunk_elements=CHUNK_ELEMENTS):
+    # Log price quantiles of each origin's simulation. Under GBM the log return over
+    # n increments is drift * n + stdev * sqrt(n) * Z, so each origin's paths are
+    # drawn at their end point; every origin gets its own draws.
+    rng = make_rng(seed)
+    batch = max(1, chunk_elements // iterations)
+    quantiles = np.empty((len(drift), len(levels)))
+    for start in range(0, len(drift), batch):
+        normals = rng.standard_normal((min(batch, len(drift) - start), iterations), dtype=np.float32)
+        quantiles[start:start + len(normals)] = np.quantile(normals, levels, axis=1).T
+    return drift[:, None] * increments[:, None] + stdev[:, None] * np.sqrt(increments)[:, None] * quantiles
+
+
+def run_backtest(close, window, horizon, iterations=10000, levels=VAR_LEVELS, stride=1, seed=None, workers=None,
+                 progress=None, cancelled=None):
+    """Replay the Monte Carlo VaR bands from every origin of a close price series.
+
+    At each origin (every stride-th day with window returns behind it and
+    horizon days ahead) drift and stdev come from the trailing window of log
+    returns, as on the daily tab, and iterations GBM paths give the price
+    quantiles at the close horizon trading days ahead. The paths follow the
+    daily tab's convention: a target d calendar days after the last close is
+    steps = d rows, row 0 being that close, so d - 1 increments of the
+    trading-day drift and stdev. Origins are simulated in batches on
+    the mc_engine process pool, each batch from its own child of
+    SeedSequence(seed). progress and cancelled work as in mc_engine.stream_paths.
+    """
+    close = close.dropna()
+    prices = close.to_numpy(dtype=float)
+    log_returns = np.diff(np.log(prices))
+    drift, stdev = rolling_stats(log_returns, window)
+    # Origin i uses returns up to its own close, log_returns[i - 1]
+    origins = np.arange(window, len(prices) - horizon, stride)
+    levels = np.asarray(levels, dtype=float)
+    if len(origins) == 0:
+        raise ValueError("The history is too short for this window and horizon")
+    steps = (close.index[origins + horizon] - close.index[origins]).days.to_numpy()
+
+    workers = workers or default_workers(len(origins) * iterations)
+    batches = np.array_split(np.arange(len(origins)), min(len(origins), workers * TASKS_PER_WORKER))
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    args = [(drift[origins[batch] - 1], stdev[origins[batch] - 1], steps[batch] - 1, iterations, levels, batch_seed)
+            for batch, batch_seed in zip(batches, seeds)]
+
+    log_bands = np.empty((len(origins), len(levels)))
+    if workers == 1:
+        for done, (batch, batch_args) in enumerate(zip(batches, args)):
+            if cancelled is not None and cancelled.is_set():
+                raise SimulationCancelled()
+            log_bands[batch] = _origin_quantiles(*batch_args)
+            if progress is not None:
+                progress((done + 1) / len(batches))
+    else:
+        futures = {process_pool().submit(_origin_quantiles, *batch_args): batch for batch, batch_args in zip(batches, args)}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                if cancelled is not None and cancelled.is_set():
+                    raise SimulationCancelled()
+                for future in done:
+                    log_bands[futures[future]] = future.result()
+                if progress is not None:
+                    progress(1 - len(pending) / len(futures))
+        finally:
+            for future in pending:
+                future.cancel()
+
+    return BacktestResult(
+        dates=close.index[origins].to_numpy(),
+        prices=prices[origins],
+        realized=prices[origins + horizon],
+        bands=prices[origins][:, None] * np.exp(log_bands),
+        levels=levels,
+        horizon=horizon,
+        steps=steps,
+    )
+
+
+def kupiec_pof(exceedances, observations, rate):
+    """Kupiec proportion-of-failures likelihood ratio and its chi-squared (1 dof) p-value."""
+    x, n = exceedances, observations
+    observed = x / n
+
+    def log_likelihood(p):
+        # x log p + (n - x) log(1 - p), with 0 log 0 = 0
+        return (x * math.log(p) if x else 0.0) + ((n - x) * math.log(1 - p) if n - x else 0.0)
+
+    ratio = max(0.0, -2 * (log_likelihood(rate) - log_likelihood(observed)))
+    # Survival function of chi-squared with one degree of freedom
+    return ratio, math.erfc(math.sqrt(ratio / 2))
+
+
+def coverage(result):
+    """Exceedance rate and Kupiec test per level of a BacktestResult, as a DataFrame.
+
+    A level below 0.5 is exceeded when the realized price ends under its band,
+    one above 0.5 when it ends over it.
+    """
+    rows = []
+    for column, level in enumerate(result.levels):
+        lower = level < 0.5
+        hits = result.realized < result.bands[:, column] if lower else result.realized > result.bands[:, column]
+        expected = level if lower else 1 - level
+        ratio, p_value = kupiec_pof(int(hits.sum()), len(hits), expected)
+        rows.append({
+            "Band": f"{'Lower' if lower else 'Upper'} VaR ({level:.0%})",
+            "Expected rate": expected,
+            "Exceedances": int(hits.sum()),
+            "Origins": len(hits),
+            "Observed rate": hits.mean(),
+            "Kupiec LR": ratio,
+            "p-value": p_value,
+        })
+    return pd.DataFrame(rows).set_index("Band")
@@ -0,0 +1,71 @@
+"""Cold-start benchmark for streamlit_app.py.
+
+Runs the app script once in a fresh interpreter (Streamlit bare mode, so the
+default Main page) and fails when that takes longer than the budget or when a
+heavy module that only other pages need was imported on the way.
+
+    python benchmarks/cold_start.py                # budget from COLD_START_BUDGET or the default
+    python benchmarks/cold_start.py --budget 2.5   # seconds
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Seconds for a fresh interpreter to import Streamlit and render the Main page
+DEFAULT_BUDGET = float(os.environ.get("COLD_START_BUDGET", "2.0"))
+
+# Only the data pages need these; the app shell and Main page must not load them
+DEFERRED_MODULES = ["yfinance", "scipy", "pyarrow", "seaborn", "matplotlib", "bs4", "prettytable"]
+
+RUNS = 3
+
+_PROBE = """
+import json, runpy, sys, time, warnings
+warnings.simplefilter("ignore")
+started = time.perf_counter()
+import streamlit
+streamlit_done = time.perf_counter()
+runpy.run_path("streamlit_app.py", run_name="__main__")
+finished = time.perf_counter()
+print(json.dumps({
+    "streamlit": streamlit_done - started,
+    "total": finished - started,
+    "loaded": sorted(name for name in %r if name in sys.modules),
+}))
+"""
+
+
+def measure():
+    probe = _PROBE % (DEFERRED_MODULES,)
+    result = subprocess.run([sys.executable, "-c", probe], cwd=REPO, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="cold start budget in seconds")
+    args = parser.parse_args()
+
+    # The best of a few runs, so one slow disk read does not fail the check
+    runs = [measure() for _ in range(RUNS)]
+    best = min(runs, key=lambda run: run["total"])
+    print(f"cold start: {best['total']:.2f}s (import streamlit {best['streamlit']:.2f}s, "
+          f"app and Main page {best['total'] - best['streamlit']:.2f}s), budget {args.budget:.2f}s")
+
+    failed = False
+    if best["total"] > args.budget:
+        print(f"FAIL: cold start is over budget by {best['total'] - args.budget:.2f}s")
+        failed = True
+    if best["loaded"]:
+        print(f"FAIL: imported on the cold path: {', '.join(best['loaded'])}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Benchmark of mc_engine.simulate_paths against the loop it replaced.
+
+    python benchmarks/mc_engine.py            # one year of daily steps x 10,000 paths
+    python benchmarks/mc_engine.py 252 50000  # steps, iterations
+    python benchmarks/mc_engine.py --stream   # peak memory of stream_paths, 10k to 1M paths
+    python benchmarks/mc_engine.py --summary  # risk_summary.summarize against repeated np.percentile
+    python benchmarks/mc_engine.py --grid     # scenario_grid against one stream_paths run per scenario
+    python benchmarks/mc_engine.py --joint    # simulate_joint, 5 assets, against correlating every step
+    python benchmarks/mc_engine.py --payoffs  # asian_payoffs over many strikes against one pass per strike
+    python benchmarks/mc_engine.py --backtest # rolling stats and run_backtest over 20 years of daily closes
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from scipy.stats import norm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mc_engine import scenario_grid, simulate_joint, simulate_paths, stream_paths
+from risk_summary import summarize
+from payoffs import asian_payoffs, stream_month_averages
+from backtest import rolling_stats, run_backtest
+
+S0, DRIFT, STDEV = 80.0, 0.0001, 0.02
+RUNS = 5
+
+
+def loop_paths(S0, drift, stdev, steps, iterations):
+    # The page code before mc_engine: inverse-CDF normals and a Python loop over time
+    daily_returns = np.exp(drift + stdev * norm.ppf(np.random.rand(steps, iterations)))
+    price_list = np.zeros_like(daily_returns)
+    price_list[0] = S0
+    for t in range(1, steps):
+        price_list[t] = price_list[t - 1] * daily_returns[t]
+    return price_list
+
+
+def best_of(fn, *args, **kwargs):
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        fn(*args, **kwargs)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def stream_memory(steps=730):
+    # Peak traced memory should stay flat as the number of paths grows
+    for iterations in (10000, 100000, 1000000):
+        tracemalloc.start()
+        started = time.perf_counter()
+        sketch = stream_paths(S0, DRIFT, STDEV, steps, iterations, seed=0)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"stream_paths {steps} steps x {iterations:>8} paths  {elapsed:6.2f} s  peak {peak / 1e6:6.1f} MB  "
+              f"terminal P5 {sketch.quantile(0.05, step=-1):.2f}")
+
+
+def percentile_figures(price_list):
+    # The page code before risk_summary: one full-matrix percentile per figure
+    return ([np.percentile(price_list, q) for q in (5, 1, 95, 99, 30, 80, 30, 80)]
+            + [np.percentile(price_list, q, axis=1) for q in (30, 80)])
+
+
+def summary_timings(steps=365, iterations=100000):
+    price_list = simulate_paths(S0, DRIFT, STDEV, steps, iterations, seed=0, dtype=np.float64)
+    sketch = stream_paths(S0, DRIFT, STDEV, steps, iterations, seed=0)
+    print(f"{steps} steps x {iterations} paths")
+    baseline = best_of(percentile_figures, price_list)
+    print(f"10x np.percentile        {baseline * 1000:8.1f} ms")
+    for distribution in ("pooled", "terminal"):
+        elapsed = best_of(summarize, price_list, distribution)
+        print(f"summarize array {distribution:<9}{elapsed * 1000:8.1f} ms  ({baseline / elapsed:.1f}x)")
+        elapsed = best_of(summarize, sketch, distribution)
+        print(f"summarize sketch {distribution:<8}{elapsed * 1000:8.1f} ms  ({baseline / elapsed:.0f}x)")
+
+
+def grid_timings(iterations=100000):
+    horizons = [30, 60, 90, 180, 365, 730]
+    stats = [(DRIFT, STDEV * (1 + years / 10)) for years in range(1, 11)]
+    levels = [0.01, 0.05, 0.30, 0.50, 0.80, 0.95, 0.99]
+    print(f"{len(horizons)} horizons x {len(stats)} lookbacks x {iterations} paths")
+    grid = best_of(scenario_grid, S0, stats, horizons, iterations, levels, seed=0)
+    print(f"scenario_grid            {grid * 1000:8.1f} ms")
+    longest = best_of(stream_paths, S0, DRIFT, STDEV, max(horizons), iterations, seed=0)
+    print(f"stream_paths {max(horizons)} steps     {longest * 1000:8.1f} ms  ({grid / longest:.1f} single runs)")
+    singles = sum(best_of(stream_paths, S0, DRIFT, STDEV, horizon, iterations, seed=0) for horizon in horizons) * len(stats)
+    print(f"one run per scenario     {singles * 1000:8.1f} ms  ({singles / grid:.0f}x the grid)")
+
+
+def stepwise_joint(S0, drift, covariance, steps, iterations):
+    # Correlated shocks for every step, summed: the same law as simulate_joint's direct draw
+    factor = np.linalg.cholesky(covariance).T.astype(np.float32)
+    log_final = np.zeros((iterations, len(drift)), dtype=np.float32)
+    for _ in range(steps - 1):
+        log_final += np.random.standard_normal((iterations, len(drift))).astype(np.float32) @ factor
+    return S0 * np.exp(log_final + drift * (steps - 1))
+
+
+def joint_timings(steps=253):
+    correlation = np.full((5, 5), 0.3) + 0.7 * np.eye(5)
+    stdevs = np.array([0.025, 0.005, 0.012, 0.013, 0.014])
+    covariance = correlation * np.outer(stdevs, stdevs)
+    S0s, drifts = np.array([80.0, 100.0, 5000.0, 18000.0, 38000.0]), np.zeros(5)
+    for iterations in (100000, 1000000):
+        elapsed = best_of(simulate_joint, S0s, drifts, covariance, steps, iterations, seed=0)
+        print(f"simulate_joint {iterations:>8} paths x 5 assets  {elapsed * 1000:8.1f} ms")
+    elapsed = best_of(stepwise_joint, S0s, drifts, covariance, steps, 100000)
+    print(f"per-step shocks  {100000:>8} paths x 5 assets  {elapsed * 1000:8.1f} ms  ({steps} steps)")
+
+
+def per_strike_payoffs(averages, strikes):
+    # One pass over every average per strike
+    return [(np.maximum(averages - strike, 0).mean(axis=1), np.maximum(strike - averages, 0).mean(axis=1)) for strike in strikes]
+
+
+def payoff_timings(iterations=1000000):
+    import pandas as pd
+    dates = pd.date_range("2025-01-01", "2025-12-31", freq="D")
+    started = time.perf_counter()
+    averages = stream_month_averages(S0, DRIFT, STDEV, dates, iterations, seed=0)
+    print(f"stream_month_averages {len(dates)} days x {iterations} paths  {(time.perf_counter() - started) * 1000:8.1f} ms")
+    for count in (10, 100, 1000):
+        strikes = np.linspace(40, 140, count)
+        elapsed = best_of(asian_payoffs, averages, strikes)
+        line = f"asian_payoffs {averages.shape[0]} months x {count:>4} strikes  {elapsed * 1000:8.1f} ms"
+        if count <= 100:
+            baseline = best_of(per_strike_payoffs, averages, strikes)
+            line += f"   one pass per strike {baseline * 1000:8.1f} ms"
+        print(line)
+
+
+def from_scratch_stats(log_returns, window):
+    # Every window's mean and variance recomputed at its origin
+    drift, stdev = np.full(len(log_returns), np.nan), np.full(len(log_returns), np.nan)
+    for i in range(window - 1, len(log_returns)):
+        returns = log_returns[i - window + 1:i + 1]
+        variance = returns.var(ddof=1)
+        drift[i], stdev[i] = returns.mean() - variance / 2, np.sqrt(variance)
+    return drift, stdev
+
+
+def backtest_timings(days=5040, window=504, horizon=21, iterations=10000):
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    log_returns = DRIFT + STDEV * rng.standard_normal(days)
+    close = pd.Series(S0 * np.exp(np.cumsum(log_returns)), index=pd.bdate_range("2005-01-03", periods=days))
+    elapsed = best_of(rolling_stats, log_returns, window)
+    baseline = best_of(from_scratch_stats, log_returns, window)
+    print(f"rolling_stats {days} returns, window {window}  {elapsed * 1000:8.2f} ms   from scratch {baseline * 1000:8.1f} ms")
+    for stride in (horizon, 1):
+        started = time.perf_counter()
+        result = run_backtest(close, window, horizon, iterations, stride=stride, seed=0)
+        print(f"run_backtest stride {stride:>2}: {len(result.prices):>5} origins x {iterations} paths  "
+              f"{(time.perf_counter() - started) * 1000:8.1f} ms")
+
+
+def main():
+    if "--stream" in sys.argv:
+        stream_memory()
+        return
+    if "--summary" in sys.argv:
+        summary_timings()
+        return
+    if "--grid" in sys.argv:
+        grid_timings()
+        return
+    if "--joint" in sys.argv:
+        joint_timings()
+        return
+    if "--payoffs" in sys.argv:
+        payoff_timings()
+        return
+    if "--backtest" in sys.argv:
+        backtest_timings()
+        return
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    baseline = best_of(loop_paths, S0, DRIFT, STDEV, steps, iterations)
+    print(f"{steps} steps x {iterations} paths")
+    print(f"loop + norm.ppf      {baseline * 1000:8.1f} ms")
+    for dtype in (np.float64, np.float32):
+        elapsed = best_of(simulate_paths, S0, DRIFT, STDEV, steps, iterations, seed=0, dtype=dtype)
+        print(f"simulate_paths {np.dtype(dtype).name:<7}{elapsed * 1000:7.1f} ms  ({baseline / elapsed:.1f}x)")
+
+    # Same distribution: compare terminal quantiles
+    reference = np.percentile(loop_paths(S0, DRIFT, STDEV, steps, 200000 // max(1, steps // 100))[-1], [5, 50, 95])
+    engine = np.percentile(simulate_paths(S0, DRIFT, STDEV, steps, 200000 // max(1, steps // 100), seed=1)[-1], [5, 50, 95])
+    print("terminal P5/P50/P95  loop", np.round(reference, 2), " engine", np.round(engine, 2))
+
+
+if __name__ == "__main__":
+    main()
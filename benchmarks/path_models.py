@@ -0,0 +1,86 @@
+"""Paths per second of each mc_engine path model, through stream_paths.
+
+The models are fitted to a synthetic GARCH(1,1) history of ten years of daily
+returns. One such history pins alpha and beta down only to a few hundredths,
+so the fit is checked over FITS histories against the true parameters. A
+per-path Python GARCH loop is timed on a few paths for contrast.
+
+    python benchmarks/path_models.py            # one year of daily steps x 100,000 paths
+    python benchmarks/path_models.py 24 100000  # steps, paths
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+# Imported here so the fit timing below is the fit alone
+import scipy.optimize  # noqa: F401
+import scipy.signal  # noqa: F401
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mc_engine import block_bootstrap, fit_garch, stream_paths
+
+S0 = 80.0
+HISTORY = 2520
+RUNS = 3
+FITS = 20
+
+
+def synthetic_history(seed=0, mu=0.0002, omega=2e-6, alpha=0.08, beta=0.9):
+    rng = np.random.default_rng(seed)
+    variance, shock, returns = omega / (1 - alpha - beta), 0.0, np.empty(HISTORY)
+    for t in range(HISTORY):
+        variance = omega + alpha * shock ** 2 + beta * variance
+        shock = np.sqrt(variance) * rng.standard_normal()
+        returns[t] = mu + shock
+    return returns
+
+
+def garch_loop(model, steps, iterations, seed=0):
+    # One path at a time, the shape a first implementation would take
+    rng = np.random.default_rng(seed)
+    final = np.empty(iterations)
+    for i in range(iterations):
+        variance, shock, log_price = model.last_variance, model.last_shock, 0.0
+        for _ in range(steps - 1):
+            variance = model.omega + model.alpha * shock ** 2 + model.beta * variance
+            shock = np.sqrt(variance) * rng.standard_normal()
+            log_price += model.mu + shock
+        final[i] = S0 * np.exp(log_price)
+    return final
+
+
+def best_of(fn, *args, **kwargs):
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        fn(*args, **kwargs)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 253
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    returns = synthetic_history()
+    drift, stdev = returns.mean() - returns.var() / 2, returns.std()
+
+    started = time.perf_counter()
+    garch = fit_garch(returns)
+    print(f"fit_garch on {HISTORY} returns {(time.perf_counter() - started) * 1000:.0f} ms")
+    fits = np.array([[model.alpha, model.beta] for model in (fit_garch(synthetic_history(seed)) for seed in range(FITS))])
+    mean, spread = fits.mean(axis=0), fits.std(axis=0, ddof=1)
+    print(f"over {FITS} histories: alpha {mean[0]:.3f} +/- {spread[0]:.3f}, beta {mean[1]:.3f} +/- {spread[1]:.3f} "
+          f"(true 0.080, 0.900)")
+
+    print(f"{steps} steps x {iterations} paths")
+    for name, model in (("GBM", None), ("block bootstrap", block_bootstrap(returns)), ("GARCH(1,1)", garch)):
+        elapsed = best_of(stream_paths, S0, drift, stdev, steps, iterations, seed=0, model=model)
+        print(f"{name:<18}{iterations / elapsed:>12,.0f} paths/s")
+    loop_paths = 200
+    elapsed = best_of(garch_loop, garch, steps, loop_paths)
+    print(f"{'GARCH per-path loop':<18}{loop_paths / elapsed:>12,.0f} paths/s")
+
+
+if __name__ == "__main__":
+    main()
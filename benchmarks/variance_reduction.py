@@ -0,0 +1,80 @@
+"""Standard error of the terminal VaR quantiles per millisecond for each sampling mode.
+
+Every mode is run REPLICATIONS times with different seeds; the spread of its
+estimates is its standard error. Efficiency is 1 / (SE^2 x ms), relative to
+today's page setting (pseudo-random, 10,000 paths) for the same path model,
+and "paths for today's SE" is how many paths the mode needs to match that
+setting's error at 1% VaR. The samplings are measured under GBM; the control
+variate only applies to GARCH (under GBM it is the final price itself), so it
+is measured on a GARCH(1,1) fitted to benchmarks/path_models.py's synthetic
+history.
+
+    python benchmarks/variance_reduction.py            # one year of daily steps, 2,500 paths per mode
+    python benchmarks/variance_reduction.py 24 1000    # steps, paths per mode
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mc_engine import fit_garch, sobol_iterations, stream_paths
+from path_models import synthetic_history
+from risk_summary import summarize
+
+S0, DRIFT, STDEV = 80.0, 0.0001, 0.02
+REPLICATIONS = 30
+LEVELS = (0.01, 0.05, 0.95, 0.99)
+BASELINE_PATHS = 10000
+
+# (model, modes of (name, sampling, control variate))
+MODES = [
+    ("GBM", [
+        ("pseudo-random", "standard", False),
+        ("antithetic", "antithetic", False),
+        ("sobol", "sobol", False),
+    ]),
+    ("GARCH(1,1)", [
+        ("pseudo-random", "standard", False),
+        ("control variate", "standard", True),
+        ("antithetic + cv", "antithetic", True),
+        ("sobol + cv", "sobol", True),
+    ]),
+]
+
+
+def replicate(steps, iterations, sampling, control_variate, model):
+    estimates = []
+    started = time.perf_counter()
+    for seed in range(REPLICATIONS):
+        sketch = stream_paths(S0, DRIFT, STDEV, steps, iterations, seed=seed,
+                              sampling=sampling, control_variate=control_variate, model=model)
+        var = summarize(sketch, bands=()).var
+        estimates.append([var[level] for level in LEVELS])
+    elapsed = (time.perf_counter() - started) / REPLICATIONS * 1000
+    return np.std(estimates, axis=0, ddof=1), elapsed
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 253
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2500
+    models = {"GBM": None, "GARCH(1,1)": fit_garch(synthetic_history())}
+    print(f"{steps} steps, {REPLICATIONS} replications; SE of VaR at {', '.join(f'{level:.0%}' for level in LEVELS)}")
+    for model_name, modes in MODES:
+        model = models[model_name]
+        baseline_se, baseline_ms = replicate(steps, BASELINE_PATHS, "standard", False, model)
+        baseline_efficiency = 1 / (baseline_se ** 2 * baseline_ms)
+        print(model_name)
+        print(f"  {'today (pseudo-random)':<22}{BASELINE_PATHS:>7} paths {baseline_ms:7.1f} ms  SE {np.round(baseline_se, 3)}")
+        for name, sampling, control_variate in modes:
+            paths = sobol_iterations(iterations) if sampling == "sobol" else iterations
+            se, elapsed = replicate(steps, iterations, sampling, control_variate, model)
+            efficiency = 1 / (se ** 2 * elapsed) / baseline_efficiency
+            needed = int(np.ceil(paths * (se[0] / baseline_se[0]) ** 2))
+            print(f"  {name:<22}{paths:>7} paths {elapsed:7.1f} ms  SE {np.round(se, 3)}  "
+                  f"SE^2 x ms gain {np.round(efficiency, 1)}  paths for today's SE {needed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+import resilience
+
+# Suppress SSL verification warnings
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+EIA_API_KEY = os.environ.get("EIA_API_KEY", 'gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h')
+
+STEO_URL = 'https://api.eia.gov/v2/steo/data/'
+SNDW_URL = 'https://api.eia.gov/v2/petroleum/sum/sndw/data/'
+
+# Upper bound on concurrent requests to api.eia.gov (also the connection pool size)
+MAX_WORKERS = 8
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+    session.mount("https://", adapter)
+    session.verify = False
+    return session
+
+
+# One keep-alive session and one bounded pool shared by every page and every rerun
+session = _make_session()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="eia")
+
+
+def steo_params(frequency, start):
+    # Query template for the Short-Term Energy Outlook endpoint
+    return {
+        "api_key": EIA_API_KEY,
+        "frequency": frequency,
+        "data[]": "value",
+        "start": start,
+        "sort[0][column]": "period",
+        "sort[0][direction]": "desc",
+        "offset": 0,
+        "length": 5000
+    }
+
+
+def sndw_params(start):
+    # Query template for the weekly petroleum supply (sndw) endpoint
+    return {
+        "api_key": EIA_API_KEY,
+        "frequency": "weekly",
+        "data[0]": "value",
+        "start": start,
+        "sort[0][column]": "period",
+        "sort[0][direction]": "desc",
+        "offset": 0,
+        "length": 5000
+    }
+
+
+def fetch_data(api_url, params):
+    # Timeouts, retries and the api.eia.gov circuit breaker come from resilience.POLICIES["eia"]
+    try:
+        response = resilience.get("eia", api_url, session=session, params=params)
+        return response.json()
+    except requests.exceptions.HTTPError as err:
+        print(f"HTTP error occurred: {err}")
+    except Exception as err:
+        print(f"An error occurred: {err}")
+    return None
+
+
+def submit(fn, *args):
+    # Run any EIA-bound callable on the shared pool
+    return _executor.submit(fn, *args)
+
+
+def pivot_series(rows, series_ids, facet="seriesId"):
+    """Pivot EIA long-format rows into a period x series DataFrame (newest period first)."""
+    frame = pd.DataFrame.from_records(rows, columns=['period', facet, 'value'])
+    frame['value'] = pd.to_numeric(frame['value'], errors='coerce')
+    frame = frame.drop_duplicates(subset=['period', facet], keep='last')
+    wide = frame.pivot(index='period', columns=facet, values='value')
+    wide = wide.reindex(columns=list(series_ids)).sort_index(ascending=False)
+    wide.columns.name = None
+    return wide
+
+
+def fetch_batch(api_url, params_template, series_ids, facet="seriesId"):
+    """Fetch many series in one paginated request and return a period x series DataFrame."""
+    params = params_template.copy()
+    # requests encodes a list as a repeated facets[...][] key, one per series
+    params[f"facets[{facet}][]"] = list(series_ids)
+    rows = []
+    offset = 0
+    while True:
+        params["offset"] = offset
+        result = fetch_data(api_url, params)
+        if not result:
+            print(f"Failed to fetch data for series {', '.join(series_ids)}")
+            break
+        page = result.get('response', {}).get('data', [])
+        rows.extend(page)
+        offset += len(page)
+        total = int(result.get('response', {}).get('total', offset))
+        if not page or offset >= total:
+            break
+    return pivot_series(rows, series_ids, facet)
@@ -0,0 +1,206 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from eia_client import fetch_batch, submit
+from local_store import background_refresh_active, cache_path, file_lock, oldest_refresh, read_frame, write_frame
+
+# A stored series is read locally, without touching the network, for this long
+REFRESH_AFTER = timedelta(hours=1)
+
+# How many trailing periods to re-request on a refresh. STEO re-issues its
+# forecast months and EIA revises recent weekly figures, so a refresh starts a
+# little before the newest stored period and overwrites those rows.
+REVISION_WINDOW = {"annual": 3, "monthly": 24, "weekly": 4}
+
+
+def _route(api_url):
+    # 'https://api.eia.gov/v2/petroleum/sum/sndw/data/' -> ('petroleum', 'sum', 'sndw')
+    path = api_url.split("/v2/", 1)[1]
+    return tuple(part for part in path.split("/") if part and part != "data")
+
+
+def _series_path(api_url, frequency, series_id):
+    return cache_path("eia", *_route(api_url), frequency, f"{series_id}.parquet")
+
+
+def _refresh_start(last_period, frequency):
+    # Step back REVISION_WINDOW periods from the newest stored (or current) period
+    window = REVISION_WINDOW.get(frequency, 0)
+    if frequency == "weekly":
+        newest = min(datetime.strptime(last_period, "%Y-%m-%d").date(), date.today())
+        return (newest - timedelta(weeks=window)).strftime("%Y-%m-%d")
+    freq = "Y" if frequency == "annual" else "M"
+    newest = min(pd.Period(last_period, freq), pd.Period(date.today(), freq))
+    return str(newest - window)
+
+
+def _plan(stored, meta, start, frequency, max_age):
+    """Return the start= to request for one series, or None if the stored copy is enough."""
+    if stored is None or meta.get("covered_from", start) > start:
+        return start
+    if max_age is None or time.time() - meta.get("refreshed_at", 0) < max_age.total_seconds():
+        return None
+    if stored.empty:
+        return start
+    return max(start, _refresh_start(stored["period"].max(), frequency))
+
+
+def _upsert(stored, fresh):
+    if stored is None or stored.empty:
+        return fresh.sort_values("period", ignore_index=True)
+    merged = pd.concat([stored, fresh], ignore_index=True)
+    merged = merged.drop_duplicates(subset="period", keep="last")
+    return merged.sort_values("period", ignore_index=True)
+
+
+def load_series(api_url, params_template, series_ids, facet="seriesId", max_age=REFRESH_AFTER, offline=False):
+    """Return a period x series DataFrame (newest first) served from the local store.
+
+    Only periods after the newest stored one, plus a short revision window, are
+    requested from EIA, and only once the stored copy is older than max_age.
+    While the prefetch scheduler is running it owns refreshes, so stored copies
+    are served as they are. Series that need the same start= share one batched
+    request.
+    """
+    if background_refresh_active() and max_age == REFRESH_AFTER:
+        max_age = None
+    frequency = params_template["frequency"]
+    start = str(params_template["start"])
+    paths = {series_id: _series_path(api_url, frequency, series_id) for series_id in series_ids}
+    # Files are swapped in atomically, so offline reads need no lock
+    locks = [] if offline else [file_lock(paths[series_id]) for series_id in sorted(series_ids)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        stored = {}
+        metas = {}
+        pending = {}
+        for series_id, path in paths.items():
+            frame, meta = read_frame(path)
+            stored[series_id] = frame
+            metas[series_id] = meta
+            refresh_start = None if offline else _plan(frame, meta, start, frequency, max_age)
+            if refresh_start is not None:
+                pending.setdefault(refresh_start, []).append(series_id)
+
+        for refresh_start, pending_ids in pending.items():
+            params = params_template.copy()
+            params["start"] = refresh_start
+            fresh = fetch_batch(api_url, params, pending_ids, facet)
+            if fresh.empty:
+                # Keep serving whatever is on disk; the next render retries
+                continue
+            for series_id in pending_ids:
+                column = fresh[series_id].dropna()
+                frame = _upsert(stored[series_id], pd.DataFrame({"period": column.index, "value": column.values}))
+                covered_from = min(metas[series_id].get("covered_from", refresh_start), refresh_start)
+                metas[series_id] = {"covered_from": covered_from, "refreshed_at": time.time()}
+                write_frame(frame, paths[series_id], metas[series_id])
+                stored[series_id] = frame
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+    columns = {}
+    for series_id in series_ids:
+        frame = stored[series_id]
+        if frame is None or frame.empty:
+            columns[series_id] = pd.Series(dtype=float)
+            continue
+        frame = frame[frame["period"] >= start]
+        columns[series_id] = pd.Series(frame["value"].values, index=frame["period"].values)
+    wide = pd.DataFrame(columns, columns=list(series_ids)).sort_index(ascending=False)
+    wide.index.name = "period"
+    wide.attrs["refreshed_at"] = oldest_refresh(metas.values())
+    return wide
+
+
+def submit_load(api_url, params_template, series_ids, facet="seriesId"):
+    # Run load_series on the shared EIA pool; .result() gives the wide frame
+    return submit(load_series, api_url, params_template, series_ids, facet)
+
+
+def series_rows(wide, series_id):
+    # Back to the [{'period', 'value'}, ...] newest-first shape the inventory charts use
+    column = wide[series_id].dropna()
+    return [{'period': period, 'value': value} for period, value in column.items()]
+
+
+class _CoalescedLoad:
+    # Future-like view over one or more shared loads, sliced to the caller's start
+    def __init__(self, futures, series_ids, start):
+        self._futures = futures
+        self._series_ids = list(series_ids)
+        self._start = start
+
+    def result(self):
+        frames = {}
+        loads = []
+        for series_id in self._series_ids:
+            loaded = self._futures[series_id].result()
+            frames[series_id] = loaded[series_id]
+            loads.append(loaded.attrs)
+        wide = pd.DataFrame(frames, columns=self._series_ids)
+        wide = wide[wide.index >= self._start].sort_index(ascending=False)
+        wide.index.name = "period"
+        wide.attrs["refreshed_at"] = oldest_refresh(loads)
+        return wide
+
+
+class RequestCoalescer:
+    """Coalesces the load_series calls made while rendering one page.
+
+    Calls are keyed on (endpoint, frequency, facet, series). A call whose range
+    is already covered by an earlier or in-flight load shares that load and is
+    sliced locally; ranges declared up front with plan() are merged so the first
+    load of a series already fetches the widest range any caller will ask for.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._planned = {}
+        self._loads = {}
+
+    @staticmethod
+    def _key(api_url, params_template, series_id, facet):
+        return (api_url, params_template["frequency"], facet, series_id)
+
+    def plan(self, api_url, params_template, series_ids, facet="seriesId"):
+        # Declare a range that will be requested later in the render
+        start = str(params_template["start"])
+        with self._lock:
+            for series_id in series_ids:
+                key = self._key(api_url, params_template, series_id, facet)
+                self._planned[key] = min(self._planned.get(key, start), start)
+
+    def submit(self, api_url, params_template, series_ids, facet="seriesId"):
+        """Start (or join) the loads behind a request; .result() gives the sliced wide frame."""
+        start = str(params_template["start"])
+        futures = {}
+        with self._lock:
+            missing = []
+            for series_id in series_ids:
+                covered = self._loads.get(self._key(api_url, params_template, series_id, facet))
+                if covered is not None and covered[0] <= start:
+                    futures[series_id] = covered[1]
+                else:
+                    missing.append(series_id)
+            if missing:
+                keys = [self._key(api_url, params_template, series_id, facet) for series_id in missing]
+                superset_start = min([start] + [self._planned.get(key, start) for key in keys])
+                params = params_template.copy()
+                params["start"] = superset_start
+                future = submit_load(api_url, params, missing, facet)
+                for key, series_id in zip(keys, missing):
+                    self._loads[key] = (superset_start, future)
+                    futures[series_id] = future
+        return _CoalescedLoad(futures, series_ids, start)
+
+    def load(self, api_url, params_template, series_ids, facet="seriesId", offline=False):
+        if offline:
+            # The stored copy needs no coalescing; it is read straight from disk
+            return load_series(api_url, params_template, series_ids, facet, offline=True)
+        return self.submit(api_url, params_template, series_ids, facet).result()
@@ -1,51 +1,67 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import plotly.express as px
-import requests
-import yfinance as yf
 from datetime import datetime, timedelta
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import plotly.graph_objs as go
-import time
-
+from price_store import load_close
+from serving import RenderBudget
+from streamlit_compat import fragment
+from treasury_store import FIRST_YEAR, load_yield_curve
+
+
+# Define the ticker symbols and their corresponding names
+equity_tickers = {
+    '^GSPC': 'S&P 500',
+    '^DJI': 'Dow Jones Industrial Average',
+    '^IXIC': 'NASDAQ Composite',
+    'BZ=F': 'Brent Crude Oil',
+    '000001.SS': 'Shanghai Composite Index',
+    '^N225': 'Nikkei 225',
+    '^GDAXI': 'DAX',
+    '^FTSE': 'FTSE 100',
+    '^NSEI': 'NIFTY 50'
+}
+
+# Define the FX ticker symbols and their corresponding names
+fx_tickers = {
+    'BZ=F': 'Brent Crude Oil',
+    'EURUSD=X': 'EUR/USD',
+    'JPY=X': 'USD/JPY',
+    'GBPUSD=X': 'GBP/USD',
+    'AUDUSD=X': 'AUD/USD',
+    'USDCAD=X': 'USD/CAD',
+    'USDCHF=X': 'USD/CHF',
+    'NZDUSD=X': 'NZD/USD',
+    'DX-Y.NYB': 'US Dollar Index'
+}
 
 
 def financial_markets_page():
     st.header("Financial Market Indicators")
+    # Slow upstreams are shown from their stored snapshot at the render deadline
+    budget = RenderBudget()
     # Add financial markets page specific code here
-    tab1, tab2, tab3 = st.tabs(["Equities","Fixed Income","FX"])
-
-    with tab1:
-        # Define the ticker symbols and their corresponding names
-        tickers = {
-            '^GSPC': 'S&P 500',
-            '^DJI': 'Dow Jones Industrial Average',
-            '^IXIC': 'NASDAQ Composite',
-            'BZ=F': 'Brent Crude Oil',
-            '000001.SS': 'Shanghai Composite Index',
-            '^N225': 'Nikkei 225',
-            '^GDAXI': 'DAX',
-            '^FTSE': 'FTSE 100',
-            '^NSEI': 'NIFTY 50'
-        }
+    # Only the selected section runs on a rerun (st.tabs would run every tab body)
+    section = st.radio("Section", ["Equities", "Fixed Income", "FX"],
+                       horizontal=True, key="financial_markets_section", label_visibility="collapsed")
 
+    if section == "Equities":
         # Function to fetch data and plot heatmap
         def fetch_and_plot_correlation(period):
-            # Determine the start date based on the selected period
-            end_date = datetime.now()
+            # Determine the start date based on the selected period. It is a whole day, so every
+            # rerun passes the same arguments and joins the refresh already in flight
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             if period == '1 Year':
-                start_date = end_date - timedelta(days=365)
+                start_date = today - timedelta(days=365)
             elif period == '5 Years':
-                start_date = end_date - timedelta(days=5*365)
+                start_date = today - timedelta(days=5*365)
             elif period == '10 Years':
-                start_date = end_date - timedelta(days=10*365)
+                start_date = today - timedelta(days=10*365)
             
-            # Fetch historical data
-            data = yf.download(list(tickers.keys()), start=start_date, end=end_date)['Adj Close']
+            # Fetch historical data (a fragment rerun gets its own render deadline)
+            data = RenderBudget().serve("prices", load_close, list(equity_tickers.keys()), start_date)
             
             # Rename columns to equity names
-            data.rename(columns=tickers, inplace=True)
+            data.rename(columns=equity_tickers, inplace=True)
             
             # Calculate the correlation matrix
             correlation_matrix = data.corr()
@@ -60,123 +76,101 @@ def financial_markets_page():
             
             st.plotly_chart(fig, use_container_width=True)
 
+        # Changing the period reruns only this chart
+        @fragment
+        def correlation_chart():
+            # Dropdown menu for selecting period
+            period = st.selectbox('Select Period:', ['1 Year', '5 Years', '10 Years'])
+
+            # Fetch data and plot correlation matrix
+            fetch_and_plot_correlation(period)
+
         # Streamlit app layout
         st.title('Correlation Matrix of Stock Markets and Brent Crude Oil Prices')
 
-        # Dropdown menu for selecting period
-        period = st.selectbox('Select Period:', ['1 Year', '5 Years', '10 Years'])
+        correlation_chart()
 
-        # Fetch data and plot correlation matrix
-        fetch_and_plot_correlation(period)
-
-    with tab2:
+    if section == "Fixed Income":
+        # Moving the history slider reruns only this section
+        @fragment
+        def yield_curve_section():
         
-        current_year = datetime.now().year
-        previous_year = current_year - 1
-        previousprevious_year = current_year - 2
-
-        # Python code to download data from Treasury
-        def get_data():
-            all_data = []
-            for year in [current_year, previous_year,previousprevious_year]:
-                print(year)
-                year = str(year)
-                url1 = f'https://home.treasury.gov/resource-center/data-chart-center/interest-rates/daily-treasury-rates.csv/'+year+'/all?type=daily_treasury_yield_curve&field_tdr_date_value='+year+'page&_format=csv'
-                
-                data = pd.read_csv(url1)
-                all_data.append(data)
-            
-            pd_alldata = pd.concat(all_data, ignore_index=True)
-            pd_alldata['Date'] = pd.to_datetime(pd_alldata['Date'])
-            pd_alldata.index = pd_alldata['Date']
-            
-            req_cols = ['1 Mo','2 Mo','3 Mo', '6 Mo', '1 Yr', '2 Yr', '3 Yr', '5 Yr', 
-                        '7 Yr', '10 Yr', '20 Yr', '30 Yr']
-            final = pd_alldata[req_cols]
+            current_year = datetime.now().year
 
-            return final
+            # Closed years come from the local cache, so a longer history costs no extra downloads
+            years_of_history = st.slider('Years of yield history:', min_value=3, max_value=current_year - FIRST_YEAR + 1, value=3, key="treasury_years")
 
-        # Get the data
-        data = get_data()
+            # Get the data (a fragment rerun gets its own render deadline)
+            data = RenderBudget().serve("treasury", load_yield_curve, range(current_year - years_of_history + 1, current_year + 1))
 
 
-        # Create traces for each column
-        traces = []
-        for col in data.columns:
-            trace = go.Scatter(x=data.index, y=data[col], mode='lines', name=col)
-            traces.append(trace)
+            # Create traces for each column
+            traces = []
+            for col in data.columns:
+                trace = go.Scattergl(x=data.index, y=data[col], mode='lines', name=col)
+                traces.append(trace)
 
-        # Create layout
-        layout = go.Layout(title='Treasury Yield Time Series',
-                        xaxis=dict(title='Date'),
-                        yaxis=dict(title='Yield (%)'))
+            # Create layout
+            layout = go.Layout(title='Treasury Yield Time Series',
+                            xaxis=dict(title='Date'),
+                            yaxis=dict(title='Yield (%)'))
 
-        # Create figure
-        fig = go.Figure(data=traces, layout=layout)
+            # Create figure
+            fig = go.Figure(data=traces, layout=layout)
 
-        st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True)
 
-        #########################
+            #########################
 
-        # Extract the first and seventh rows
-        Current = data.iloc[0]
-        Last_week = data.iloc[6]
-        Last_Month = data.iloc[29]
-        Last_Year = data.iloc[364]
+            # Extract the first and seventh rows
+            Current = data.iloc[0]
+            Last_week = data.iloc[6]
+            Last_Month = data.iloc[29]
+            Last_Year = data.iloc[364]
 
-        # Create a figure
-        fig = go.Figure()
+            # Create a figure
+            fig = go.Figure()
 
-        # Add first row data to the plot
-        fig.add_trace(go.Scatter(x=Current.index, y=Current.values, mode='lines', name='Current'))
+            # Add first row data to the plot
+            fig.add_trace(go.Scatter(x=Current.index, y=Current.values, mode='lines', name='Current'))
 
-        # Add seventh row data to the plot
-        fig.add_trace(go.Scatter(x=Last_week.index, y=Last_week.values, mode='lines', name='Last Week'))
+            # Add seventh row data to the plot
+            fig.add_trace(go.Scatter(x=Last_week.index, y=Last_week.values, mode='lines', name='Last Week'))
 
-        # Add seventh row data to the plot
-        fig.add_trace(go.Scatter(x=Last_Month.index, y=Last_Month.values, mode='lines', name='Last Month'))
+            # Add seventh row data to the plot
+            fig.add_trace(go.Scatter(x=Last_Month.index, y=Last_Month.values, mode='lines', name='Last Month'))
 
-        # Add seventh row data to the plot
-        fig.add_trace(go.Scatter(x=Last_Year.index, y=Last_Year.values, mode='lines', name='Last Year'))
+            # Add seventh row data to the plot
+            fig.add_trace(go.Scatter(x=Last_Year.index, y=Last_Year.values, mode='lines', name='Last Year'))
 
-        # Customize layout
-        fig.update_layout(
-            title="Treasury Yield Curve",
-            xaxis_title="Maturity",
-            yaxis_title="Rate (%)"
-        )
+            # Customize layout
+            fig.update_layout(
+                title="Treasury Yield Curve",
+                xaxis_title="Maturity",
+                yaxis_title="Rate (%)"
+            )
 
-        # Show the plot
-        st.plotly_chart(fig, use_container_width=True)
+            # Show the plot
+            st.plotly_chart(fig, use_container_width=True)
 
+        yield_curve_section()
 
-    with tab3:
-        # Define the FX ticker symbols and their corresponding names
-        fx_tickers = {
-            'BZ=F': 'Brent Crude Oil',
-            'EURUSD=X': 'EUR/USD',
-            'JPY=X': 'USD/JPY',
-            'GBPUSD=X': 'GBP/USD',
-            'AUDUSD=X': 'AUD/USD',
-            'USDCAD=X': 'USD/CAD',
-            'USDCHF=X': 'USD/CHF',
-            'NZDUSD=X': 'NZD/USD',
-            'DX-Y.NYB': 'US Dollar Index'
-        }
 
+    if section == "FX":
         # Function to fetch data and plot heatmap
         def fetch_and_plot_fx_correlation(period):
-            # Determine the start date based on the selected period
-            end_date = datetime.now()
+            # Determine the start date based on the selected period. It is a whole day, so every
+            # rerun passes the same arguments and joins the refresh already in flight
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             if period == '1 Year':
-                start_date = end_date - timedelta(days=365)
+                start_date = today - timedelta(days=365)
             elif period == '5 Years':
-                start_date = end_date - timedelta(days=5*365)
+                start_date = today - timedelta(days=5*365)
             elif period == '10 Years':
-                start_date = end_date - timedelta(days=10*365)
+                start_date = today - timedelta(days=10*365)
             
-            # Fetch historical data
-            data = yf.download(list(fx_tickers.keys()), start=start_date, end=end_date)['Adj Close']
+            # Fetch historical data (a fragment rerun gets its own render deadline)
+            data = RenderBudget().serve("prices", load_close, list(fx_tickers.keys()), start_date)
             
             # Rename columns to FX pair names
             data.rename(columns=fx_tickers, inplace=True)
@@ -194,14 +188,19 @@ def financial_markets_page():
             
             st.plotly_chart(fig, use_container_width=True)
 
+        # Changing the period reruns only this chart, not the DXY/Brent charts below
+        @fragment
+        def fx_correlation_chart():
+            # Dropdown menu for selecting period
+            fx_period = st.selectbox('Select Period for FX:', ['1 Year', '5 Years', '10 Years'])
+
+            # Fetch data and plot correlation matrix
+            fetch_and_plot_fx_correlation(fx_period)
+
         # Streamlit app layout
         st.title('Correlation Matrix of FX Pairs')
 
-        # Dropdown menu for selecting period
-        fx_period = st.selectbox('Select Period for FX:', ['1 Year', '5 Years', '10 Years'])
-
-        # Fetch data and plot correlation matrix
-        fetch_and_plot_fx_correlation(fx_period)
+        fx_correlation_chart()
 
      # Function to plot time series of DXY and Brent
         def plot_time_series():
@@ -209,8 +208,9 @@ def financial_markets_page():
             start_date = datetime(2007, 7, 1)
             
             # Fetch data for DXY and Brent Crude Oil
-            df_dxy = yf.download("DX-Y.NYB", start=start_date)['Adj Close']
-            df_brent = yf.download("BZ=F", start=start_date)['Adj Close']
+            prices = budget.serve("prices", load_close, ["DX-Y.NYB", "BZ=F"], start_date)
+            df_dxy = prices["DX-Y.NYB"].dropna()
+            df_brent = prices["BZ=F"].dropna()
 
             fig_ts = go.Figure()
 
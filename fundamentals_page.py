@@ -1,83 +1,104 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.graph_objs as go
-import seaborn as sns
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
-import yfinance as yf
 from datetime import datetime
 from collections import defaultdict
-import requests
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta    
+from eia_client import STEO_URL, SNDW_URL, steo_params, sndw_params
+from eia_store import RequestCoalescer, load_series, series_rows
+from price_store import load_history
+from serving import RenderBudget
+from streamlit_compat import fragment
+
+
+# STEO and weekly inventory series shown on this page (also refreshed by prefetch_scheduler.py)
+production_series_id = "PAPR_WORLD"
+consumption_series_id = "PATC_WORLD"
+
+production_components = {
+    "COPR_OPEC": 'OPEC Crude Oil Production',
+    "OPEC_NC": 'OPEC Other Liquids Production',
+    "COPR_NONOPEC": 'Non-OPEC Crude Oil Production',
+    "NONOPEC_NC": 'Non-OPEC Other Liquids Production',
+}
+monthly_production_components = {
+    "COPR_OPECPLUS": 'OPEC+ Production',
+    "COPRPUS": 'US Production',
+    "COPR_NONOPECPLUS_XUS": 'Non OPEC+ exUS Production',
+}
+
+consumption_components = {
+    "PATC_CA": 'Canada Petroleum Consumption',
+    "PATC_OECD_EUROPE": 'Europe OECD Petroleum Consumption',
+    "PATC_JA": 'Japan Petroleum Consumption',
+    "PATC_US": 'United States Petroleum Consumption',
+    "PATC_UST": 'U.S. Territories Petroleum Consumption',
+    "PATC_OTHER_OECD": 'Other OECD Petroleum Consumption',
+    "PATC_CH": 'China Petroleum Consumption',
+    "PATC_FSU": 'Eurasia Petroleum Consumption',
+    "PATC_NONOECD_EUROPE": 'Europe non-OECD Petroleum Consumption',
+    "PATC_OTHER_ASIA": 'Other Asia Petroleum Consumption',
+    "PATC_OTHER_NONOECD": 'Other Non-OECD Petroleum Consumption',
+}
+
+annual_series_ids = [production_series_id, consumption_series_id] + list(production_components) + list(consumption_components)
+
+inventory_series_ids = ['WCESTUS1', 'WGTSTUS1', 'WDISTUS1']
+
+inventory_plus_series = {
+    'WTTSTUS1': 'U.S. Ending Stocks of Crude Oil and Petroleum Products',
+    'WTESTUS1': 'U.S. Ending Stocks excluding SPR of Crude Oil and Petroleum Products',
+    'WCSSTUS1': 'U.S. Ending Stocks of Crude Oil in SPR',
+    'WGTSTUS1': 'U.S. Ending Stocks of Total Gasoline',
+    'WKJSTUS1': 'U.S. Ending Stocks of Kerosene-Type Jet Fuel',
+    'WDISTUS1': 'U.S. Ending Stocks of Distillate Fuel Oil',
+    'WCESTUS1' : 'U.S. Ending Stocks excluding SPR of Crude Oil',
+}
 
 
 def fundamentals_page():
     st.header("Fundamental Indicators")
     # Add fundamentals page specific code here
 
-    tab1, tab3, tab4, tab2, tab5, tab6 = st.tabs(["Balances", "Production", "Consumption","Seasonality", "EIA Inventory","EIA Inventory+"])
+    # Only the selected section runs on a rerun (st.tabs would run every tab body)
+    section = st.radio("Section", ["Balances", "Production", "Consumption", "Seasonality", "EIA Inventory", "EIA Inventory+"],
+                       horizontal=True, key="fundamentals_section", label_visibility="collapsed")
+
+    # Start the selected section's EIA loads up front so it waits on the slowest
+    # one instead of the sum of all of them. Loads are served from the local
+    # series store and only top it up from EIA when it is due for a refresh, so
+    # switching back to a section reads its data locally. The coalescer folds
+    # the 2024 and 5-year inventory ranges into one load per series. Loads still
+    # running at the source's render deadline are shown from the stored
+    # snapshot while they finish in the background.
+    budget = RenderBudget()
+    coalescer = RequestCoalescer()
+    if section in ("Balances", "Production", "Consumption"):
+        annual_future = budget.submit("eia", coalescer.load, STEO_URL, steo_params("annual", "2000"), annual_series_ids)
+    if section == "Production":
+        monthly_future = budget.submit("eia", coalescer.load, STEO_URL, steo_params("monthly", "1998"), list(monthly_production_components))
+    if section == "EIA Inventory":
+        start_date_2 = (datetime.now() - timedelta(days=5*365)).strftime("%Y-%m-%d")
+        coalescer.plan(SNDW_URL, sndw_params(start_date_2), inventory_series_ids, facet="series")
+        inventory_future = budget.submit("eia", coalescer.load, SNDW_URL, sndw_params("2024-01-01"), inventory_series_ids, facet="series")
+        inventory_5y_future = budget.submit("eia", coalescer.load, SNDW_URL, sndw_params(start_date_2), inventory_series_ids, facet="series")
 
-    with tab1:
+    if section == "Balances":
         st.subheader("Supply demand balances")
 
-
-        def fetch_data(api_url, params):
-            try:
-                response = requests.get(api_url, params=params, verify=False)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP error occurred: {err}")
-            except Exception as err:
-                print(f"An error occurred: {err}")
-            return None
-
-        api_url = 'https://api.eia.gov/v2/steo/data/'
-        api_key = 'gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h'
-
-        params_template = {
-            "api_key": api_key,
-            "frequency": "annual",
-            "data[]": "value",
-            "start": "2000",
-            "sort[0][column]": "period",
-            "sort[0][direction]": "desc",
-            "offset": 0,
-            "length": 5000
-        }
-
-        # Define series IDs for world production and consumption
-        production_series_id = "PAPR_WORLD"
-        consumption_series_id = "PATC_WORLD"
-
-        # Fetch production data
-        params_production = params_template.copy()
-        params_production["facets[seriesId][]"] = production_series_id
-        production_data = fetch_data(api_url, params_production)
-
-        # Fetch consumption data
-        params_consumption = params_template.copy()
-        params_consumption["facets[seriesId][]"] = consumption_series_id
-        consumption_data = fetch_data(api_url, params_consumption)
-
-        # Extract and organize the data
-        periods = sorted(list(set(int(item['period']) for item in production_data['response']['data'])))
-        production_values = {int(item['period']): float(item['value']) for item in production_data['response']['data']}
-        consumption_values = {int(item['period']): float(item['value']) for item in consumption_data['response']['data']}
-
-        # Calculate oversupply/undersupply
-        oversupply_undersupply = {year: production_values.get(year, 0) - consumption_values.get(year, 0) for year in periods}
+        balances = annual_future.result()[[production_series_id, consumption_series_id]]
+        balances = balances.dropna(subset=[production_series_id]).sort_index()
+        if balances.empty:
+            st.warning("EIA balances data is currently unavailable.")
 
         # Create a DataFrame
         df = pd.DataFrame({
-            'Year': periods,
-            'Production': [production_values.get(year, 0) for year in periods],
-            'Consumption': [consumption_values.get(year, 0) for year in periods],
-            'Oversupply/Undersupply': [oversupply_undersupply.get(year, 0) for year in periods]
+            'Year': balances.index.astype(int),
+            'Production': balances[production_series_id].values,
+            'Consumption': balances[consumption_series_id].fillna(0).values,
         })
+        df['Oversupply/Undersupply'] = df['Production'] - df['Consumption']
 
         # Create the first plot for Production and Consumption
         fig1 = go.Figure()
@@ -114,7 +135,7 @@ def fundamentals_page():
 
 
 #####################################
-    with tab2:
+    if section == "Seasonality":
         st.subheader("Seasonality Analysis")
 
         col1,col2 = st.columns(2)
@@ -123,7 +144,7 @@ def fundamentals_page():
         ticker = 'BZ=F'
         
         # Fetch historical data for the last 10 years
-        data = yf.download(ticker, start='2014-01-01', end=datetime.now())
+        data = budget.serve("prices", load_history, ticker, '2014-01-01')
         
         # Resample data to end of month to ensure we have monthly data points
         monthly_data = data['Adj Close'].resample('M').last()
@@ -197,113 +218,56 @@ def fundamentals_page():
 
 
         st.divider()
-        # Streamlit slider for selecting the period
-        period = st.slider("Period (in years)", min_value=1, max_value=len(monthly_avg_pct_change), value=12)
 
-        # Function to update the plot based on the selected period
-        def update_plot(period):
-            # Calculate the number of years
-            num_years = len(monthly_avg_pct_change)
+        # Dragging the slider reruns only this chart, not the loads and heatmaps above
+        @fragment
+        def seasonality_bar_chart(monthly_avg_pct_change):
+            # Streamlit slider for selecting the period
+            period = st.slider("Period (in years)", min_value=1, max_value=len(monthly_avg_pct_change), value=12)
+
+            # Function to update the plot based on the selected period
+            def update_plot(period):
+                # Calculate the number of years
+                num_years = len(monthly_avg_pct_change)
             
-            # Calculate the start index for the selected period
-            start_index = max(0, num_years - period)
+                # Calculate the start index for the selected period
+                start_index = max(0, num_years - period)
             
-            # Select the relevant data for the period
-            monthly_data_period = monthly_avg_pct_change.iloc[start_index:]
+                # Select the relevant data for the period
+                monthly_data_period = monthly_avg_pct_change.iloc[start_index:]
             
-            # Calculate the average percentage change for each month across the selected period
-            monthly_avg_pct_change_across_years = monthly_data_period.mean(axis=0)
+                # Calculate the average percentage change for each month across the selected period
+                monthly_avg_pct_change_across_years = monthly_data_period.mean(axis=0)
             
-            # Define custom color palette
-            colors = ['red' if val < 0 else 'green' for val in monthly_avg_pct_change_across_years.values]
+                # Define custom color palette
+                colors = ['red' if val < 0 else 'green' for val in monthly_avg_pct_change_across_years.values]
             
-            # Create Plotly bar chart for average month-on-month change across all years
-            fig = go.Figure(data=[
-                go.Bar(x=monthly_avg_pct_change_across_years.index, y=monthly_avg_pct_change_across_years.values, marker_color=colors)
-            ])
-            fig.update_layout(
-                title=f'Average Month-on-Month Percentage Change of Brent Crude Oil Prices (Period: {period} years)',
-                xaxis_title='Month',
-                yaxis_title='Average Percentage Change',
-                xaxis=dict(tickmode='array', tickvals=list(range(1, 13)), ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
-            )
-            st.plotly_chart(fig, use_container_width=True)
+                # Create Plotly bar chart for average month-on-month change across all years
+                fig = go.Figure(data=[
+                    go.Bar(x=monthly_avg_pct_change_across_years.index, y=monthly_avg_pct_change_across_years.values, marker_color=colors)
+                ])
+                fig.update_layout(
+                    title=f'Average Month-on-Month Percentage Change of Brent Crude Oil Prices (Period: {period} years)',
+                    xaxis_title='Month',
+                    yaxis_title='Average Percentage Change',
+                    xaxis=dict(tickmode='array', tickvals=list(range(1, 13)), ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+            # Call the update plot function with the initial period value
+            update_plot(period)
 
-        # Call the update plot function with the initial period value
-        update_plot(period)
+        seasonality_bar_chart(monthly_avg_pct_change)
 
 
 #######################################################################
-    with tab3:
+    if section == "Production":
         st.subheader("Oil Productions")
 
-        # Suppress SSL verification warnings
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-        def fetch_data(api_url, params):
-            try:
-                response = requests.get(api_url, params=params, verify=False)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP error occurred: {err}")
-            except Exception as err:
-                print(f"An error occurred: {err}")
-            return None
-
-        api_url = 'https://api.eia.gov/v2/steo/data/'
-        api_key = 'gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h'
-
-        params_template = {
-            "api_key": api_key,
-            "frequency": "annual",
-            "data[]": "value",
-            "start": "2000",
-            "sort[0][column]": "period",
-            "sort[0][direction]": "desc",
-            "offset": 0,
-            "length": 5000
-        }
-
-        # Define the series IDs for each component with new names
-        series_ids = {
-            "OPEC-13 Petroleum Production": ["COPR_OPEC", "OPEC_NC"],
-            "Non-OPEC Petroleum Production": ["COPR_NONOPEC", "NONOPEC_NC"]
-        }
-
-        # Function to fetch data for multiple series IDs
-        def fetch_multiple_series(api_url, params_template, series_ids):
-            data = {}
-            for category, sub_series in series_ids.items():
-                data[category] = {}
-                for sub_series_id in sub_series:
-                    params = params_template.copy()
-                    params["facets[seriesId][]"] = sub_series_id
-                    result = fetch_data(api_url, params)
-                    if result:
-                        data[category][sub_series_id] = result['response']['data']
-                    else:
-                        print(f"Failed to fetch data for series {sub_series_id}")
-            return data
-
-        # Fetch the data
-        data = fetch_multiple_series(api_url, params_template, series_ids)
-
-        # Extract and organize the data
-        periods = [int(item['period']) for item in data['OPEC-13 Petroleum Production']['COPR_OPEC']]
-        opec_crude = [float(item['value']) for item in data['OPEC-13 Petroleum Production']['COPR_OPEC']]
-        opec_other_liquids = [float(item['value']) for item in data['OPEC-13 Petroleum Production']['OPEC_NC']]
-        nonopec_crude = [float(item['value']) for item in data['Non-OPEC Petroleum Production']['COPR_NONOPEC']]
-        nonopec_other_liquids = [float(item['value']) for item in data['Non-OPEC Petroleum Production']['NONOPEC_NC']]
-
-        # Create a DataFrame
-        df = pd.DataFrame({
-            'Year': periods,
-            'OPEC Crude Oil Production': opec_crude,
-            'OPEC Other Liquids Production': opec_other_liquids,
-            'Non-OPEC Crude Oil Production': nonopec_crude,
-            'Non-OPEC Other Liquids Production': nonopec_other_liquids
-        })
+        # Collect the annual production components
+        df = annual_future.result()[list(production_components)].dropna(how='all')
+        df = df.rename(columns=production_components).rename_axis('Year').reset_index()
+        df['Year'] = df['Year'].astype(int)
 
         # Calculate total values for stacking
         df['OPEC-13 Petroleum Production'] = df['OPEC Crude Oil Production'] + df['OPEC Other Liquids Production']
@@ -341,48 +305,12 @@ def fundamentals_page():
             )
 
         #####
-        def fetch_data(api_url, params):
-            try:
-                response = requests.get(api_url, params=params, verify=False)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP error occurred: {err}")
-            except Exception as err:
-                print(f"An error occurred: {err}")
-            return None
-
-        api_url = 'https://api.eia.gov/v2/steo/data/'
-        api_key = 'gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h'
-
-        params = {
-            "api_key": api_key,
-            "frequency": "monthly",
-            "data[]": "value",
-            "start": "1998",
-            "sort[0][column]": "period",
-            "sort[0][direction]": "desc",
-            "offset": 0,
-            "length": 5000
-        }
-
-        # Fetch OPEC+ production data
-        params["facets[seriesId][]"] = "COPR_OPECPLUS"
-        data_production_OPECPLUS = fetch_data(api_url, params)
-
-        # Fetch US production data
-        params["facets[seriesId][]"] = "COPRPUS"
-        data_production_US = fetch_data(api_url, params)
-
-        # Fetch US production data
-        params["facets[seriesId][]"] = "COPR_NONOPECPLUS_XUS"
-        data_production_NONOPECxUS = fetch_data(api_url, params)
-
-        # Extract production data
-        periods = [item['period'] for item in data_production_OPECPLUS['response']['data']]
-        production_values_OPECPLUS = [float(item['value']) for item in data_production_OPECPLUS['response']['data']]
-        production_values_US = [float(item['value']) for item in data_production_US['response']['data']]
-        production_values_NONOPECxUS = [float(item['value']) for item in data_production_NONOPECxUS['response']['data']]
+        # Collect the monthly OPEC+, US and non-OPEC+ ex-US production
+        monthly_production = monthly_future.result().dropna(how='all')
+        periods = list(monthly_production.index)
+        production_values_OPECPLUS = list(monthly_production["COPR_OPECPLUS"])
+        production_values_US = list(monthly_production["COPRPUS"])
+        production_values_NONOPECxUS = list(monthly_production["COPR_NONOPECPLUS_XUS"])
 
         # Calculate market share percentage of OPEC+ over total volume
         total_volume = [p + c + d for p, c , d in zip(production_values_OPECPLUS, production_values_US, production_values_NONOPECxUS)]
@@ -442,92 +370,12 @@ def fundamentals_page():
 
 
 ##################################################
-    with tab4:
+    if section == "Consumption":
         st.subheader("Oil Consumptions")
-        # Suppress SSL verification warnings
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-        def fetch_data(api_url, params):
-            try:
-                response = requests.get(api_url, params=params, verify=False)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP error occurred: {err}")
-            except Exception as err:
-                print(f"An error occurred: {err}")
-            return None
-
-        api_url = 'https://api.eia.gov/v2/steo/data/'
-        api_key = 'gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h'
-
-        params_template = {
-            "api_key": api_key,
-            "frequency": "annual",
-            "data[]": "value",
-            "start": "2000",
-            "sort[0][column]": "period",
-            "sort[0][direction]": "desc",
-            "offset": 0,
-            "length": 5000
-        }
-
-        # Define the series IDs for each component with new names
-        series_ids = {
-            "Total OECD Petroleum Consumption": ["PATC_CA", "PATC_OECD_EUROPE", "PATC_JA", "PATC_US", "PATC_UST", "PATC_OTHER_OECD"],
-            "Total non-OECD Petroleum Consumption": ["PATC_CH", "PATC_FSU", "PATC_NONOECD_EUROPE", "PATC_OTHER_ASIA", "PATC_OTHER_NONOECD"]
-        }
-
-        # Function to fetch data for multiple series IDs
-        def fetch_multiple_series(api_url, params_template, series_ids):
-            data = {}
-            for category, sub_series in series_ids.items():
-                data[category] = {}
-                for sub_series_id in sub_series:
-                    params = params_template.copy()
-                    params["facets[seriesId][]"] = sub_series_id
-                    result = fetch_data(api_url, params)
-                    if result:
-                        data[category][sub_series_id] = result['response']['data']
-                    else:
-                        print(f"Failed to fetch data for series {sub_series_id}")
-            return data
-
-        # Fetch the data
-        data = fetch_multiple_series(api_url, params_template, series_ids)
-
-        # Extract and organize the data
-        periods = [int(item['period']) for item in next(iter(data['Total OECD Petroleum Consumption'].values()))]
-
-        # Extract sub-component data
-        canada_consumption = [float(item['value']) for item in data['Total OECD Petroleum Consumption']['PATC_CA']]
-        europe_oecd_consumption = [float(item['value']) for item in data['Total OECD Petroleum Consumption']['PATC_OECD_EUROPE']]
-        japan_consumption = [float(item['value']) for item in data['Total OECD Petroleum Consumption']['PATC_JA']]
-        us_consumption = [float(item['value']) for item in data['Total OECD Petroleum Consumption']['PATC_US']]
-        us_territories_consumption = [float(item['value']) for item in data['Total OECD Petroleum Consumption']['PATC_UST']]
-        other_oecd_consumption = [float(item['value']) for item in data['Total OECD Petroleum Consumption']['PATC_OTHER_OECD']]
-
-        china_consumption = [float(item['value']) for item in data['Total non-OECD Petroleum Consumption']['PATC_CH']]
-        eurasia_consumption = [float(item['value']) for item in data['Total non-OECD Petroleum Consumption']['PATC_FSU']]
-        europe_nonoecd_consumption = [float(item['value']) for item in data['Total non-OECD Petroleum Consumption']['PATC_NONOECD_EUROPE']]
-        other_asia_consumption = [float(item['value']) for item in data['Total non-OECD Petroleum Consumption']['PATC_OTHER_ASIA']]
-        other_nonoecd_consumption = [float(item['value']) for item in data['Total non-OECD Petroleum Consumption']['PATC_OTHER_NONOECD']]
-
-        # Create a DataFrame
-        df_annual_consumption = pd.DataFrame({
-            'Year': periods,
-            'Canada Petroleum Consumption': canada_consumption,
-            'Europe OECD Petroleum Consumption': europe_oecd_consumption,
-            'Japan Petroleum Consumption': japan_consumption,
-            'United States Petroleum Consumption': us_consumption,
-            'U.S. Territories Petroleum Consumption': us_territories_consumption,
-            'Other OECD Petroleum Consumption': other_oecd_consumption,
-            'China Petroleum Consumption': china_consumption,
-            'Eurasia Petroleum Consumption': eurasia_consumption,
-            'Europe non-OECD Petroleum Consumption': europe_nonoecd_consumption,
-            'Other Asia Petroleum Consumption': other_asia_consumption,
-            'Other Non-OECD Petroleum Consumption': other_nonoecd_consumption
-        })
+        # Collect the regional consumption components
+        df_annual_consumption = annual_future.result()[list(consumption_components)].dropna(how='all')
+        df_annual_consumption = df_annual_consumption.rename(columns=consumption_components).rename_axis('Year').reset_index()
+        df_annual_consumption['Year'] = df_annual_consumption['Year'].astype(int)
 
         # Calculate total values for stacking
         df_annual_consumption['Total OECD Petroleum Consumption'] = (
@@ -592,11 +440,8 @@ def fundamentals_page():
 
 
 ###########################
-    with tab5:
+    if section == "EIA Inventory":
         st.subheader("EIA Weekly Inventory numbers")
-        # Suppress SSL verification warnings
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
          # Series to fetch
         series_list = {
             'WGTSTUS1': 'U.S. Ending Stocks of Total Gasoline',
@@ -604,15 +449,9 @@ def fundamentals_page():
             'WCESTUS1' : 'U.S. Ending Stocks excluding SPR of Crude Oil',
         }
 
-        # Function to fetch data from the API
+        # Function to fetch data from the API (sliced from the load started at the top of the page)
         def fetch_data(series):
-            url = f"https://api.eia.gov/v2/petroleum/sum/sndw/data/?api_key=gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h&frequency=weekly&data[0]=value&facets[series][]={series}&start=2024-01-01&sort[0][column]=period&sort[0][direction]=desc&offset=0&length=5000"
-            response = requests.get(url, verify=False)
-            if response.status_code == 200:
-                return response.json().get('response', {}).get('data', [])
-            else:
-                print(f"Failed to fetch data for series {series}: {response.status_code} {response.reason}")
-                return []
+            return series_rows(inventory_future.result(), series)
 
         # Function to calculate W-o-W changes
         def calculate_wow_changes(data):
@@ -623,7 +462,8 @@ def fundamentals_page():
 
 
         # Fetch data for each series
-        series_data = {series: fetch_data(series) for series in series_list}
+        inventory = inventory_future.result()
+        series_data = {series: series_rows(inventory, series) for series in inventory_series_ids}
 
         def plot_series(series_key, series_name):
             # Fetch data for the series
@@ -682,16 +522,6 @@ def fundamentals_page():
                 st.plotly_chart(fig, use_container_width=True)
 
 
-        # Function to fetch data from the API
-        def fetch_data_2(series, start_date):
-            url = f"https://api.eia.gov/v2/petroleum/sum/sndw/data/?api_key=gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h&frequency=weekly&data[0]=value&facets[series][]={series}&start={start_date}&sort[0][column]=period&sort[0][direction]=desc&offset=0&length=5000"
-            response = requests.get(url, verify=False)
-            if response.status_code == 200:
-                return response.json().get('response', {}).get('data', [])
-            else:
-                st.error(f"Failed to fetch data for series {series}: {response.status_code} {response.reason}")
-                return []
-            
         # Function to calculate 5-year range and average
         def calculate_five_year_stats(data):
             weekly_values = defaultdict(list)
@@ -711,12 +541,12 @@ def fundamentals_page():
             'WDISTUS1': 'U.S. Ending Stocks of Distillate Fuel Oil',
         }
 
-
-        # Calculate the start date for 5 years of historical data
-        start_date_2 = (datetime.now() - timedelta(days=5*365)).strftime("%Y-%m-%d")
-
-        # Fetch data for each series
-        series_data_2 = {series: fetch_data_2(series, start_date_2) for series in series_list}
+        # Fetch data for each series (5 years of history, requested at the top of the page)
+        inventory_5y = inventory_5y_future.result()
+        series_data_2 = {series: series_rows(inventory_5y, series) for series in series_list}
+        for series, data in series_data_2.items():
+            if not data:
+                st.error(f"Failed to fetch data for series {series}")
 
 
         # Create separate plots for each series
@@ -808,31 +638,18 @@ def fundamentals_page():
             st.plotly_chart(figs['fig3'], use_container_width=True)
 
 
-        with tab6:
+    if section == "EIA Inventory+":
+        # Moving the date picker reruns only this section
+        @fragment
+        def inventory_plus_section():
+            # A fragment rerun gets its own render deadline
+            budget = RenderBudget()
 
             st.subheader("EIA Weekly Inventory numbers")
 
-            
-                # Function to fetch data from the API
-            def fetch_data(series,start_date):
-                url = f"https://api.eia.gov/v2/petroleum/sum/sndw/data/?api_key=gcp5ZkcZhaL5aCVvviD38eMtVEZXEyP28KqMHh4h&frequency=weekly&data[0]=value&facets[series][]={series}&start={start_date}&sort[0][column]=period&sort[0][direction]=desc&offset=0&length=5000"
-                response = requests.get(url, verify=False)
-                if response.status_code == 200:
-                    return response.json()['response']['data']
-                else:
-                    print(f"Failed to fetch data for series {series}")
-                    return []
 
             # Series to fetch
-            series_list = {
-                'WTTSTUS1': 'U.S. Ending Stocks of Crude Oil and Petroleum Products',
-                'WTESTUS1': 'U.S. Ending Stocks excluding SPR of Crude Oil and Petroleum Products',
-                'WCSSTUS1': 'U.S. Ending Stocks of Crude Oil in SPR',
-                'WGTSTUS1': 'U.S. Ending Stocks of Total Gasoline',
-                'WKJSTUS1': 'U.S. Ending Stocks of Kerosene-Type Jet Fuel',
-                'WDISTUS1': 'U.S. Ending Stocks of Distillate Fuel Oil',
-                'WCESTUS1' : 'U.S. Ending Stocks excluding SPR of Crude Oil',
-            }
+            series_list = inventory_plus_series
 
             # Calculate the default date (today minus three months)
             default_date = date.today() - relativedelta(months=12)
@@ -844,7 +661,8 @@ def fundamentals_page():
             start_date_str = start_date.strftime('%Y-%m-%d')
 
             # Fetch data for each series
-            series_data = {series: fetch_data(series, start_date_str) for series in series_list}
+            inventory_plus = budget.serve("eia", load_series, SNDW_URL, sndw_params(start_date_str), list(series_list), facet="series")
+            series_data = {series: series_rows(inventory_plus, series) for series in series_list}
 
             # Function to calculate W-o-W changes
             def calculate_wow_changes(data):
@@ -865,7 +683,7 @@ def fundamentals_page():
                     dates = [entry['period'] for entry in data]
                     values = [int(entry['value']) for entry in data]
                     fig_original.add_trace(go.Scatter(x=dates, y=values, mode='lines', name=series_list[series]))
-                    
+                
                     wow_dates, wow_changes = calculate_wow_changes(data)
                     fig_wow.add_trace(go.Scatter(x=wow_dates, y=wow_changes, mode='lines', name=series_list[series]))
 
@@ -891,3 +709,4 @@ def fundamentals_page():
             st.plotly_chart(fig_original, use_container_width=True)
             st.plotly_chart(fig_wow, use_container_width=True)
 
+        inventory_plus_section()
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO
+
+import pandas as pd
+import requests
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+import resilience
+from local_store import background_refresh_active, cache_path, file_lock, read_frame, write_frame
+
+# Suppress SSL verification warnings
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+GPR_URL = "https://www.matteoiacoviello.com/gpr_files/data_gpr_daily_recent.xls"
+
+# How long a parsed copy is served before asking the server whether the file changed
+CHECK_AFTER = timedelta(hours=1)
+
+# When the file was last revalidated, by any process, is kept in a small sidecar
+# next to the Parquet copy: a 304 only updates that, not the copy itself
+def _checked_path(path):
+    return path.with_name(path.stem + ".checked")
+
+
+def _read_checked(path):
+    try:
+        return float(_checked_path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return 0.0
+
+
+def _write_checked(path, at):
+    # Swapped in like the Parquet files, so readers never see a partial value
+    checked_path = _checked_path(path)
+    tmp_path = checked_path.with_name(checked_path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(repr(at))
+    os.replace(tmp_path, checked_path)
+
+
+def _parse(content):
+    df = pd.read_excel(BytesIO(content), engine='xlrd')
+    df['date'] = pd.to_datetime(df['date'])
+    # Free-text columns (e.g. event) mix strings and NaN; give them one type for Parquet
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].astype("string")
+    return df
+
+
+def _with_age(df, meta, checked_at):
+    # A 304 confirms the stored copy without rewriting it
+    if df is not None:
+        df.attrs["refreshed_at"] = max(meta.get("refreshed_at", 0), checked_at) or None
+    return df
+
+
+def load_gpr(columns=None, max_age=CHECK_AFTER, offline=False):
+    """Return the daily GPR frame, re-parsing the upstream XLS only when it has changed.
+
+    The parsed frame is kept as Parquet together with the ETag/Last-Modified of
+    the download it came from; revalidation is a conditional GET that normally
+    answers 304 Not Modified. offline=True returns the stored copy without
+    revalidating. attrs["refreshed_at"] is when the copy was last known current.
+    """
+    # While the prefetch scheduler is running it owns revalidation
+    if background_refresh_active() and max_age == CHECK_AFTER:
+        max_age = None
+    path = cache_path("gpr", "data_gpr_daily_recent.parquet")
+    if offline:
+        # The file is swapped in atomically, so offline reads need no lock
+        return _with_age(*read_frame(path, columns=columns), _read_checked(path))
+    with file_lock(path):
+        stored, meta = read_frame(path, columns=columns)
+        checked_at = max(meta.get("refreshed_at", 0), _read_checked(path))
+        recently_checked = max_age is None or time.time() - checked_at < max_age.total_seconds()
+        if stored is not None and recently_checked:
+            return _with_age(stored, meta, checked_at)
+
+        headers = {}
+        if stored is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            response = resilience.get("gpr", GPR_URL, headers=headers, verify=False)
+        except Exception as err:
+            print(f"Failed to download the GPR file: {err}")
+            return _with_age(stored, meta, checked_at)
+
+        checked_at = time.time()
+        if response.status_code == 304 and stored is not None:
+            _write_checked(path, checked_at)
+            return _with_age(stored, meta, checked_at)
+
+        df = _parse(response.content)
+        meta = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "refreshed_at": time.time(),
+        }
+        write_frame(df, path, meta)
+        _write_checked(path, checked_at)
+        return _with_age(df if columns is None else df[columns], meta, checked_at)
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Root of every on-disk cache the dashboard keeps (EIA series, prices, ...)
+CACHE_DIR = Path(os.environ.get("DASHBOARD_CACHE_DIR", Path(__file__).resolve().parent / ".cache"))
+
+# Status file kept by prefetch_scheduler.py; its heartbeat says the scheduler is running
+SCHEDULER_STATUS = CACHE_DIR / "scheduler" / "status.json"
+
+# A scheduler heartbeat older than this means nobody is keeping the caches fresh
+HEARTBEAT_TIMEOUT = 15 * 60
+
+# One lock per cache file so concurrent refreshes of the same file serialize
+_locks = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+
+
+def cache_path(*parts):
+    path = CACHE_DIR.joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def file_lock(path):
+    with _locks_guard:
+        return _locks[str(path)]
+
+
+def read_scheduler_status():
+    """Return the scheduler's status dict (heartbeat, and last refresh / next due per source)."""
+    try:
+        return json.loads(SCHEDULER_STATUS.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def background_refresh_active():
+    """True while prefetch_scheduler.py is running and keeping the caches up to date."""
+    status = read_scheduler_status() or {}
+    return time.time() - status.get("heartbeat", 0) < HEARTBEAT_TIMEOUT
+
+
+def oldest_refresh(metas):
+    # A snapshot combined from several files is as old as its stalest part
+    times = [meta["refreshed_at"] for meta in metas if meta.get("refreshed_at")]
+    return min(times) if times else None
+
+
+def read_frame(path, columns=None):
+    """Read a cached DataFrame and its metadata dict; (None, {}) when the file is missing."""
+    # pyarrow is imported here, not at module level, so the app shell can read
+    # the scheduler status without loading it
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    try:
+        table = pq.read_table(path, columns=columns)
+    except (FileNotFoundError, OSError, pa.ArrowInvalid):
+        return None, {}
+    raw = (table.schema.metadata or {}).get(b"dashboard", b"{}")
+    return table.to_pandas(), json.loads(raw)
+
+
+def write_frame(frame, path, meta=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Write to a temp file and swap it in so readers never see a partial file
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"dashboard"] = json.dumps(meta or {}).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
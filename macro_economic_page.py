@@ -1,11 +1,9 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.graph_objs as go
-import requests
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-from io import BytesIO
 import plotly.express as px
+from gpr_store import load_gpr
+from serving import RenderBudget
 
 help_GPR = """
 ## Geopolitical Risk index (GPR)
@@ -38,22 +36,11 @@ def macro_economic_page():
         
 
         st.subheader("Geopolitical Risk Daily Index",help = help_GPR)
-        # Suppress SSL verification warnings
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-        # Fetch the data
-        url = "https://www.matteoiacoviello.com/gpr_files/data_gpr_daily_recent.xls"
-        response = requests.get(url, verify=False)
-
-        
-        # Read the Excel file directly into a DataFrame using BytesIO
-        df = pd.read_excel(BytesIO(response.content), engine='xlrd')
-        print("DataFrame created successfully.")
-        # Print the headers
-        print("Headers: ", df.columns.tolist())
-        
-        # Ensure the 'date' column is in datetime format
-        df['date'] = pd.to_datetime(df['date'])
+        # Fetch the data (parsed once per upstream change and kept as Parquet)
+        df = RenderBudget().serve("gpr", load_gpr, columns=['date', 'GPRD'])
+        if df is None:
+            st.warning("The Geopolitical Risk data is currently unavailable.")
+            return
         
         # Select the relevant columns
         columns_to_plot = ['date', 'GPRD']
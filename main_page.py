@@ -1,22 +1,7 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import requests
-from datetime import datetime, timedelta
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import streamlit.components.v1 as components
 
 
-import os, sys
-from urllib.request import urlopen, Request
-from bs4 import BeautifulSoup
-from prettytable import PrettyTable
-
-# Suppress SSL verification warnings
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-
 
 def main_page():
 
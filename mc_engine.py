@@ -0,0 +1,559 @@
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+
+def log_return_stats(prices):
+    """Return (log returns, drift, stdev) of a price series; drift = mean - variance / 2."""
+    log_returns = np.log(1 + prices.pct_change())
+    drift = log_returns.mean() - 0.5 * log_returns.var()
+    return log_returns, drift, log_returns.std()
+
+
+def make_rng(seed=None):
+    # seed may be None (fresh entropy), an int, a SeedSequence or a Generator
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def simulate_paths(S0, drift, stdev, steps, iterations, seed=None, dtype=np.float32, sampling="standard", model=None):
+    """Simulate geometric Brownian motion price paths, shape (steps, iterations).
+
+    Row 0 is S0 and row t is S0 * exp(sum of t log returns drift + stdev * Z).
+    Standard normals are drawn directly and the paths are built with one
+    cumulative sum in log space, in place, so memory is a single steps x
+    iterations array of dtype. sampling is one of SAMPLINGS; "sobol" needs a
+    power-of-two number of iterations to keep its balance. model, a Bootstrap
+    or Garch, replaces GBM's log returns with that model's.
+    """
+    dtype = np.dtype(dtype).type
+    paths, _ = _log_paths(make_rng(seed), drift, stdev, steps, iterations, dtype, sampling, model=model)
+    np.exp(paths, out=paths)
+    paths *= dtype(S0)
+    return paths
+
+
+# Streaming runs generate paths in chunks of about this many values (16 MB of float32)
+CHUNK_ELEMENTS = 1 << 22
+
+# Relative accuracy of the log-bucket quantile sketch (0.2% of the price)
+RELATIVE_ACCURACY = 0.002
+
+# The sketch's buckets span this many standard deviations of the final log return;
+# prices further out are counted in the edge buckets
+SKETCH_SIGMAS = 6
+
+# What PathSketch.control_moments sums over paths: C and X are each path's control
+# and final price, L and Y their log returns
+CONTROL_MOMENTS = ("C", "C * C", "X * C", "L", "Y", "L * L", "Y * Y", "L * Y")
+
+
+# How the standard normals are drawn: "standard" pseudo-random, "antithetic" pairs
+# (Z, -Z), or "sobol" scrambled Sobol points (one dimension per step) through the
+# inverse normal CDF
+SAMPLINGS = ("standard", "antithetic", "sobol")
+
+
+def _normals(rng, steps, n, dtype, sampling, sobol=None):
+    if sampling == "standard":
+        return rng.standard_normal((steps, n), dtype=dtype)
+    if sampling == "antithetic":
+        half = rng.standard_normal((steps, (n + 1) // 2), dtype=dtype)
+        return np.concatenate([half, -half[:, :n // 2]], axis=1)
+    if sampling == "sobol":
+        from scipy.special import ndtri
+        from scipy.stats import qmc
+        sobol = sobol or qmc.Sobol(d=max(steps, 1), scramble=True, seed=rng)
+        return ndtri(sobol.random(n).T).astype(dtype)
+    raise ValueError(f"sampling must be one of {SAMPLINGS}, not {sampling!r}")
+
+
+# Block bootstrap: paths are built from blocks of block consecutive historical log returns
+Bootstrap = namedtuple("Bootstrap", ["returns", "block"])
+
+# GARCH(1,1) log returns mu + e_t, e_t = sqrt(h_t) * Z_t, h_t = omega + alpha * e_{t-1}^2 + beta * h_{t-1},
+# started from the last fitted variance and shock of the history
+Garch = namedtuple("Garch", ["mu", "omega", "alpha", "beta", "last_variance", "last_shock"])
+
+
+def block_bootstrap(log_returns, block=None):
+    """Bootstrap model of a log return series; block defaults to the cube root of its length."""
+    returns = np.asarray(log_returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    block = block or max(1, int(round(len(returns) ** (1 / 3))))
+    return Bootstrap(returns, min(block, len(returns)))
+
+
+def fit_garch(log_returns):
+    """Fit GARCH(1,1) to a log return series by maximum likelihood.
+
+    The variance recursion is a first-order linear filter of the squared
+    shocks, so each likelihood evaluation is one scipy.signal.lfilter call.
+    """
+    from scipy.optimize import minimize
+    from scipy.signal import lfilter
+
+    returns = np.asarray(log_returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    mu = returns.mean()
+    # Fit in percent so the parameters are of similar size
+    shocks = (returns - mu) * 100
+    squared = shocks ** 2
+    start_variance = squared.mean()
+
+    def variances(params):
+        omega, alpha, beta = params
+        # h_t - beta * h_{t-1} = omega + alpha * e_{t-1}^2, with h_0 the sample variance
+        drive = omega + alpha * np.concatenate([[start_variance], squared[:-1]])
+        return lfilter([1.0], [1.0, -beta], drive, zi=[beta * start_variance])[0]
+
+    def negative_log_likelihood(params):
+        h = variances(params)
+        if np.any(h <= 0):
+            return np.inf
+        return 0.5 * np.sum(np.log(h) + squared / h)
+
+    fitted = minimize(
+        negative_log_likelihood, [0.05 * start_variance, 0.08, 0.9], method="SLSQP",
+        bounds=[(1e-8 * start_variance, 10 * start_variance), (0.0, 1.0), (0.0, 1.0)],
+        constraints=[{"type": "ineq", "fun": lambda params: 0.999 - params[1] - params[2]}],
+    )
+    if not fitted.success:
+        print(f"GARCH fit did not converge: {fitted.message}")
+    omega, alpha, beta = fitted.x
+    h = variances(fitted.x)
+    return Garch(mu, omega / 1e4, alpha, beta, h[-1] / 1e4, shocks[-1] / 100)
+
+
+def model_stdev(model, stdev):
+    # Spread of one step's log return, for sizing the sketch
+    if isinstance(model, Bootstrap):
+        return max(stdev, model.returns.std())
+    if isinstance(model, Garch):
+        return max(stdev, np.sqrt(model.omega / max(1 - model.alpha - model.beta, 1e-3)), np.sqrt(model.last_variance))
+    return stdev
+
+
+def _bootstrap_returns(rng, model, steps, n, dtype):
+    # Blocks start at uniform offsets; consecutive blocks are laid end to end down each path
+    blocks = -(-max(steps - 1, 1) // model.block)
+    starts = rng.integers(0, len(model.returns) - model.block + 1, size=(blocks, n))
+    index = (starts[:, None, :] + np.arange(model.block)[None, :, None]).reshape(blocks * model.block, n)
+    log_returns = np.empty((steps, n), dtype=dtype)
+    log_returns[1:] = model.returns[index[:steps - 1]]
+    return log_returns
+
+
+def _garch_returns(normals, model, dtype):
+    # Only time is sequential: each step updates every path's variance at once
+    log_returns = normals
+    variance = np.full(normals.shape[1], model.last_variance)
+    shock = np.full(normals.shape[1], model.last_shock)
+    for t in range(1, len(normals)):
+        variance = model.omega + model.alpha * shock ** 2 + model.beta * variance
+        shock = np.sqrt(variance) * normals[t]
+        log_returns[t] = model.mu + shock
+    return log_returns
+
+
+def _log_paths(rng, drift, stdev, steps, iterations, dtype, sampling="standard", sobol=None, model=None, control=False):
+    # (log(price / S0) per step with row 0 all zeros, control log returns or None);
+    # the control is drift * (steps - 1) + stdev * sum(Z) from the path's own normals
+    if control and not isinstance(model, Garch):
+        raise ValueError("The control variate needs the GARCH model; under GBM the control is the "
+                         "final price itself, and the bootstrap draws no normals")
+    if isinstance(model, Bootstrap):
+        if sampling != "standard" or control:
+            raise ValueError("The bootstrap model draws historical returns, not normals; "
+                             "it supports neither other samplings nor the control variate")
+        log_paths = _bootstrap_returns(rng, model, steps, iterations, dtype)
+        control_returns = None
+    else:
+        log_paths = _normals(rng, steps, iterations, dtype, sampling, sobol)
+        log_paths[0] = 0
+        control_returns = None
+        if control:
+            control_returns = dtype(drift * (steps - 1)) + dtype(stdev) * log_paths[1:].sum(axis=0)
+        if isinstance(model, Garch):
+            log_paths = _garch_returns(log_paths, model, dtype)
+        else:
+            log_paths *= dtype(stdev)
+            log_paths += dtype(drift)
+    log_paths[0] = 0
+    np.cumsum(log_paths, axis=0, out=log_paths)
+    return log_paths, control_returns
+
+
+class PathSketch:
+    """Mergeable running summary of simulated price paths.
+
+    Keeps, per step, the sum of prices (for the mean path) and a histogram of
+    log(price / S0) over fixed log-width buckets, so every quantile it returns
+    is within relative_accuracy of an exact one (DDSketch-style). Memory is
+    steps x buckets and does not grow with the number of paths; two sketches
+    with the same layout merge by adding their counts.
+    """
+
+    def __init__(self, S0, steps, log_span, relative_accuracy=RELATIVE_ACCURACY, control=None):
+        self.S0 = float(S0)
+        self.steps = steps
+        self.relative_accuracy = relative_accuracy
+        self.width = np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.offset = int(np.ceil(log_span / self.width))
+        self.buckets = 2 * self.offset + 1
+        self.count = 0
+        self.sums = np.zeros(steps)
+        self.counts = np.zeros((steps, self.buckets), dtype=np.int64)
+        # Control variate: (mean, stdev) of a normal final log return whose draws are
+        # histogrammed like the final prices, so summaries can correct by its known law.
+        # control_moments sums, over paths, the products CONTROL_MOMENTS of the control
+        # and final prices (C, X) and log returns (L, Y) that the regression
+        # coefficients of the correction come from
+        self.control = control
+        if control is not None:
+            self.control_counts = np.zeros(self.buckets, dtype=np.int64)
+            self.control_moments = np.zeros(len(CONTROL_MOMENTS))
+
+    @classmethod
+    def for_model(cls, S0, drift, stdev, steps, relative_accuracy=RELATIVE_ACCURACY, control_variate=False, model=None):
+        spread = model_stdev(model, stdev)
+        log_span = abs(drift) * steps + SKETCH_SIGMAS * spread * np.sqrt(max(steps, 1))
+        control = (drift * (steps - 1), stdev * np.sqrt(max(steps - 1, 0))) if control_variate else None
+        return cls(S0, steps, log_span, relative_accuracy, control)
+
+    def _bucket(self, log_prices, index_type):
+        index = np.floor(log_prices * log_prices.dtype.type(1 / self.width)).astype(index_type)
+        index += self.offset
+        return np.clip(index, 0, self.buckets - 1, out=index)
+
+    def add_log_paths(self, log_paths, control=None):
+        """Fold a (steps, n) block of log(price / S0) paths into the sketch; log_paths is overwritten.
+
+        When the sketch has a control variate, control holds each path's control
+        log return, drawn from the same normals as the path.
+        """
+        steps, n = log_paths.shape
+        index_type = np.int32 if steps * self.buckets < 2 ** 31 else np.int64
+        if self.control is not None:
+            self.control_counts += np.bincount(self._bucket(control, index_type), minlength=self.buckets)
+            L, Y = control.astype(np.float64), log_paths[-1].astype(np.float64)
+            C, X = self.S0 * np.exp(L), self.S0 * np.exp(Y)
+            self.control_moments += [C.sum(), (C * C).sum(), (X * C).sum(), L.sum(), Y.sum(), (L * L).sum(), (Y * Y).sum(), (L * Y).sum()]
+        index = self._bucket(log_paths, index_type)
+        index += (np.arange(steps, dtype=index_type) * self.buckets)[:, None]
+        self.counts += np.bincount(index.ravel(), minlength=steps * self.buckets).reshape(steps, self.buckets)
+        np.exp(log_paths, out=log_paths)
+        self.sums += self.S0 * log_paths.sum(axis=1, dtype=np.float64)
+        self.count += n
+
+    def merge(self, other):
+        if (other.steps, other.buckets, other.width, other.S0) != (self.steps, self.buckets, self.width, self.S0):
+            raise ValueError("Cannot merge sketches with different layouts")
+        self.counts += other.counts
+        self.sums += other.sums
+        self.count += other.count
+        if self.control is not None:
+            self.control_counts += other.control_counts
+            self.control_moments += other.control_moments
+        return self
+
+    @property
+    def nbytes(self):
+        control = 0 if self.control is None else self.control_counts.nbytes
+        return self.counts.nbytes + self.sums.nbytes + control
+
+    @property
+    def mean_path(self):
+        return self.sums / self.count
+
+    @property
+    def mean(self):
+        # Mean over every step and path, like np.mean of the full price matrix
+        return self.mean_path.mean()
+
+    def _quantiles(self, counts, qs):
+        # Linear interpolation on rank inside the bucket holding each quantile
+        cumulative = np.cumsum(counts)
+        total = cumulative[-1]
+        ranks = np.asarray(qs, dtype=float) * (total - 1)
+        bucket = np.searchsorted(cumulative, ranks, side="right")
+        return self._interpolate(counts, cumulative, ranks, bucket)
+
+    def _interpolate(self, counts, cumulative, ranks, bucket):
+        bucket = np.minimum(bucket, counts.shape[-1] - 1)
+        before = np.where(bucket > 0, np.take_along_axis(cumulative, np.maximum(bucket - 1, 0), axis=-1), 0)
+        fraction = (ranks - before + 0.5) / np.maximum(np.take_along_axis(counts, bucket, axis=-1), 1)
+        log_price = (bucket - self.offset + np.clip(fraction, 0, 1)) * self.width
+        return self.S0 * np.exp(log_price)
+
+    def quantile(self, q, step=None):
+        """Price quantile(s) q in [0, 1] at one step, or over every step and path when step is None."""
+        counts = self.counts.sum(axis=0) if step is None else self.counts[step]
+        result = self._quantiles(counts, np.atleast_1d(q))
+        return result if np.ndim(q) else float(result[0])
+
+    def quantile_path(self, q):
+        """Price quantile q at every step, shape (steps,)."""
+        return self.quantile_paths([q])[0]
+
+    def quantile_paths(self, qs):
+        """Price quantiles qs at every step, shape (len(qs), steps), for all steps at once."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        ranks = np.asarray(qs, dtype=float)[None, :] * (cumulative[:, -1:] - 1)
+        # Per step, the number of buckets whose cumulative count is <= the rank
+        # (searchsorted side="right" on every row)
+        bucket = (cumulative[:, None, :] <= ranks[:, :, None]).sum(axis=2)
+        return self._interpolate(self.counts, cumulative, ranks, bucket).T
+
+    def terminal_histogram(self, bins=500):
+        """Return (bucket edges in price, counts) of the final step, coarsened to at most bins bars."""
+        counts = self.counts[-1]
+        occupied = np.flatnonzero(counts)
+        first, last = occupied[0], occupied[-1] + 1
+        group = int(np.ceil((last - first) / bins))
+        last = first + group * int(np.ceil((last - first) / group))
+        padded = np.zeros(last - first, dtype=np.int64)
+        available = counts[first:min(last, len(counts))]
+        padded[:len(available)] = available
+        edges = self.S0 * np.exp((np.arange(first, last + 1, group) - self.offset) * self.width)
+        return edges, padded.reshape(-1, group).sum(axis=1)
+
+
+def sobol_iterations(iterations):
+    # Sobol points are only balanced in blocks of a power of two
+    return 1 << max(int(iterations) - 1, 0).bit_length()
+
+
+def _chunking(rng, steps, iterations, sampling, chunk_elements):
+    # (iterations, paths per chunk, Sobol engine or None); Sobol chunks are powers of
+    # two so each is a balanced block, antithetic chunks are even so pairs stay whole
+    chunk = max(1, chunk_elements // max(steps, 1))
+    sobol = None
+    if sampling == "sobol":
+        from scipy.stats import qmc
+        sobol = qmc.Sobol(d=max(steps, 1), scramble=True, seed=rng)
+        iterations = sobol_iterations(iterations)
+        chunk = 1 << (chunk.bit_length() - 1)
+    elif sampling == "antithetic":
+        chunk += chunk % 2
+    return iterations, chunk, sobol
+
+
+def log_path_chunks(drift, stdev, steps, iterations, seed=None, dtype=np.float32, chunk_elements=CHUNK_ELEMENTS,
+                    progress=None, cancelled=None, sampling="standard", control_variate=False, model=None):
+    """Yield (log(price / S0) paths of shape (steps, n), control log returns or None) chunk by chunk.
+
+    The generator behind stream_paths, for reductions other than a PathSketch;
+    the arguments work as there. progress is called after each chunk is used.
+    """
+    dtype = np.dtype(dtype).type
+    rng = make_rng(seed)
+    iterations, chunk, sobol = _chunking(rng, steps, iterations, sampling, chunk_elements)
+    for start in range(0, iterations, chunk):
+        if cancelled is not None and cancelled.is_set():
+            raise SimulationCancelled()
+        n = min(chunk, iterations - start)
+        yield _log_paths(rng, drift, stdev, steps, n, dtype, sampling, sobol, model, control_variate)
+        if progress is not None:
+            progress((start + n) / iterations)
+
+
+def stream_paths(S0, drift, stdev, steps, iterations, seed=None, dtype=np.float32,
+                 relative_accuracy=RELATIVE_ACCURACY, chunk_elements=CHUNK_ELEMENTS, progress=None, cancelled=None,
+                 sampling="standard", control_variate=False, model=None):
+    """Simulate the same model as simulate_paths in chunks and return a PathSketch.
+
+    Only one chunk of paths is in memory at a time, so memory stays flat however
+    many iterations are requested. progress(fraction) is called after each chunk;
+    once cancelled.is_set() the run stops with SimulationCancelled.
+
+    sampling is one of SAMPLINGS; "sobol" rounds iterations up to a power of two.
+    With control_variate (GARCH only) the sketch also keeps the lognormal
+    control: the price S0 * exp(drift * (steps - 1) + stdev * sum(Z)) from
+    each path's own normals, a GBM correlated with the path whose quantiles,
+    mean and tail means are known exactly (see risk_summary). Under GBM it
+    would be the final price itself. model is None for GBM, or a Bootstrap or
+    Garch (see simulate_paths).
+    """
+    sketch = PathSketch.for_model(S0, drift, stdev, steps, relative_accuracy, control_variate, model)
+    for log_paths, control in log_path_chunks(drift, stdev, steps, iterations, seed, dtype, chunk_elements, progress,
+                                              cancelled, sampling, control_variate, model):
+        sketch.add_log_paths(log_paths, control)
+    return sketch
+
+
+def scenario_grid(S0, stats, horizons, iterations, levels, seed=None, dtype=np.float32, sampling="standard",
+                  chunk_elements=CHUNK_ELEMENTS, progress=None, cancelled=None):
+    """Price quantiles for every (drift, stdev) in stats and horizon in horizons from one set of draws.
+
+    Returns an array of shape (len(stats), len(horizons), len(levels)). Every
+    scenario shares the same normals (common random numbers), so differences
+    across the grid are not sampling noise. A horizon of h steps ends at
+    sum(Z[1:h]) like simulate_paths' row h - 1, and a price is S0 * exp(drift
+    * (h - 1) + stdev * that sum), increasing in the sum; so the quantiles of
+    the sums per horizon give every scenario's quantiles by one affine map,
+    and the grid costs one run of the longest horizon. progress, cancelled
+    and sampling work as in stream_paths.
+    """
+    dtype = np.dtype(dtype).type
+    rng = make_rng(seed)
+    horizons = np.asarray(horizons, dtype=int)
+    steps = int(horizons.max())
+    iterations, chunk, sobol = _chunking(rng, steps, iterations, sampling, chunk_elements)
+    sums = np.empty((len(horizons), iterations), dtype=dtype)
+    for start in range(0, iterations, chunk):
+        if cancelled is not None and cancelled.is_set():
+            raise SimulationCancelled()
+        n = min(chunk, iterations - start)
+        normals = _normals(rng, steps, n, dtype, sampling, sobol)
+        normals[0] = 0
+        np.cumsum(normals, axis=0, out=normals)
+        sums[:, start:start + n] = normals[horizons - 1]
+        if progress is not None:
+            progress((start + n) / iterations)
+
+    quantiles = np.quantile(sums, levels, axis=1).T
+    drift, stdev = np.asarray(stats, dtype=float).T
+    log_prices = drift[:, None, None] * (horizons - 1)[None, :, None] + stdev[:, None, None] * quantiles[None]
+    return S0 * np.exp(log_prices)
+
+
+class SimulationCancelled(Exception):
+    """Raised by a simulation whose cancelled event was set."""
+
+
+def joint_log_return_stats(prices):
+    """(drifts, covariance) of the log returns of a Date x ticker price frame, on the days every ticker has a price.
+
+    Drifts are mean - variance / 2 per ticker, as in log_return_stats.
+    """
+    log_returns = np.log(prices.dropna()).diff().dropna()
+    covariance = log_returns.cov().to_numpy()
+    return log_returns.mean().to_numpy() - 0.5 * np.diag(covariance), covariance
+
+
+def simulate_joint(S0, drift, covariance, steps, iterations, seed=None, dtype=np.float32,
+                   chunk_elements=CHUNK_ELEMENTS, progress=None, cancelled=None):
+    """Final prices of correlated GBMs, shape (iterations, assets), row 0 of each path being S0.
+
+    Each step's log returns are N(drift, covariance); the sum of steps - 1 of
+    them is N(drift * (steps - 1), covariance * (steps - 1)) exactly, so the
+    final prices are drawn directly: independent normals times the scaled
+    Cholesky factor, one matrix multiply per chunk. Raises
+    numpy.linalg.LinAlgError if covariance is not positive definite.
+    progress and cancelled work as in stream_paths.
+    """
+    dtype = np.dtype(dtype).type
+    rng = make_rng(seed)
+    drift = np.asarray(drift, dtype=float)
+    horizon = max(steps - 1, 0)
+    factor = (np.linalg.cholesky(np.asarray(covariance, dtype=float)) * np.sqrt(horizon)).T.astype(dtype)
+    final = np.empty((iterations, len(drift)), dtype=dtype)
+    chunk = max(1, chunk_elements // len(drift))
+    for start in range(0, iterations, chunk):
+        if cancelled is not None and cancelled.is_set():
+            raise SimulationCancelled()
+        n = min(chunk, iterations - start)
+        block = final[start:start + n]
+        np.matmul(rng.standard_normal((n, len(drift)), dtype=dtype), factor, out=block)
+        block += (drift * horizon).astype(dtype)
+        np.exp(block, out=block)
+        block *= np.asarray(S0, dtype=dtype)
+        if progress is not None:
+            progress((start + n) / iterations)
+    return final
+
+
+# Below this many paths per worker the process start-up and transfer costs more than it saves
+MIN_PATHS_PER_WORKER = 50000
+
+# Each worker's stream is cut into this many pool tasks, so progress and
+# cancellation move in steps of a fraction of a worker's share
+TASKS_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool():
+    # One pool of spawned workers for the life of the app; spawn, not fork, because
+    # the Streamlit process is multi-threaded
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def default_workers(iterations):
+    return max(1, min(os.cpu_count() or 1, iterations // MIN_PATHS_PER_WORKER))
+
+
+def parallel_stream_paths(S0, drift, stdev, steps, iterations, seed=None, workers=None, dtype=np.float32,
+                          relative_accuracy=RELATIVE_ACCURACY, progress=None, cancelled=None,
+                          sampling="standard", control_variate=False, model=None):
+    """stream_paths split across a process pool; returns the merged PathSketch.
+
+    Worker i's share of the paths comes from the i-th child of
+    SeedSequence(seed).spawn(workers), itself cut into TASKS_PER_WORKER tasks
+    seeded from that child's own children. Bucket counts are integers and merge
+    in any order; the per-step sums are added in task order, so the result is
+    bit-identical for a given seed, iteration count and worker count.
+    progress, cancelled, sampling, control_variate and model work as in stream_paths;
+    with "sobol" the total is rounded up to a power of two and split into equal
+    power-of-two tasks, each drawing its own independently scrambled sequence.
+    """
+    workers = workers or default_workers(iterations)
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    children = seed_sequence.spawn(workers)
+    args = (S0, drift, stdev, steps)
+    options = dict(sampling=sampling, control_variate=control_variate, model=model)
+    if workers == 1:
+        return stream_paths(*args, iterations, children[0], dtype, relative_accuracy,
+                            progress=progress, cancelled=cancelled, **options)
+    task_seeds = [task_seed for child in children for task_seed in child.spawn(TASKS_PER_WORKER)]
+    if sampling == "sobol":
+        # Each task's block must itself be a power of two, so the rounded total is
+        # split over a power-of-two number of tasks in equal shares
+        iterations = sobol_iterations(iterations)
+        task_count = min(1 << (len(task_seeds).bit_length() - 1), iterations)
+        tasks = [(iterations // task_count, task_seed) for task_seed in task_seeds[:task_count]]
+    else:
+        tasks = []
+        for i in range(workers):
+            share = iterations // workers + (i < iterations % workers)
+            for j, task_seed in enumerate(task_seeds[i * TASKS_PER_WORKER:(i + 1) * TASKS_PER_WORKER]):
+                tasks.append((share // TASKS_PER_WORKER + (j < share % TASKS_PER_WORKER), task_seed))
+    futures = {
+        process_pool().submit(stream_paths, *args, n, task_seed, dtype, relative_accuracy, **options): index
+        for index, (n, task_seed) in enumerate(tasks) if n
+    }
+
+    sketch = PathSketch.for_model(S0, drift, stdev, steps, relative_accuracy, control_variate, model)
+    sums = {}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            if cancelled is not None and cancelled.is_set():
+                raise SimulationCancelled()
+            for future in done:
+                partial = future.result()
+                sketch.counts += partial.counts
+                sketch.count += partial.count
+                if control_variate:
+                    sketch.control_counts += partial.control_counts
+                sums[futures[future]] = (partial.sums, partial.control_moments if control_variate else 0.0)
+            if progress is not None:
+                progress(len(sums) / len(futures))
+    finally:
+        for future in pending:
+            future.cancel()
+    for index in sorted(sums):
+        sketch.sums += sums[index][0]
+        if control_variate:
+            sketch.control_moments += sums[index][1]
+    return sketch
@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from mc_engine import log_path_chunks
+
+# Expected payoffs per month (rows) and strike (columns), undiscounted: swap is
+# average - strike, call max(average - strike, 0), put max(strike - average, 0),
+# above the probability that the average settles above the strike
+AsianPayoffs = namedtuple("AsianPayoffs", ["swap", "call", "put", "above"])
+
+
+def month_groups(dates):
+    """(month labels, index of each month's first date) of a sorted sequence of dates."""
+    months = pd.DatetimeIndex(dates).to_period("M")
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    return months[starts], starts
+
+
+def calendar_month_average(paths, dates):
+    """Average price per calendar month of a (steps, iterations) price matrix whose rows fall on dates.
+
+    One np.add.reduceat pass over the rows; returns (month labels, averages of
+    shape (months, iterations)).
+    """
+    labels, starts = month_groups(dates)
+    days = np.diff(np.r_[starts, len(dates)])
+    return labels, np.add.reduceat(paths, starts, axis=0) / days[:, None]
+
+
+def stream_month_averages(S0, drift, stdev, dates, iterations, seed=None, dtype=np.float32, progress=None,
+                          cancelled=None, sampling="standard", model=None):
+    """Simulate daily paths from S0 over dates and return their calendar-month averages.
+
+    dates[0] is today, whose price S0 is known, and each later date is one
+    step; months are averaged over their simulated days only. Paths are made
+    in chunks as in mc_engine.stream_paths, so memory is the (months,
+    iterations) result plus one chunk. The arguments work as there.
+    """
+    dates = pd.DatetimeIndex(dates)
+    labels, starts = month_groups(dates[1:])
+    days = np.diff(np.r_[starts, len(dates) - 1])
+    averages = np.empty((len(labels), iterations), dtype=dtype)
+    start = 0
+    for log_paths, _ in log_path_chunks(drift, stdev, len(dates), iterations, seed, dtype, progress=progress,
+                                        cancelled=cancelled, sampling=sampling, model=model):
+        n = log_paths.shape[1]
+        if start + n > averages.shape[1]:
+            # Sobol rounds the number of paths up
+            averages = np.concatenate([averages, np.empty((len(labels), start + n - averages.shape[1]), dtype=dtype)], axis=1)
+        np.exp(log_paths, out=log_paths)
+        averages[:, start:start + n] = np.add.reduceat(log_paths[1:], starts, axis=0) * (dtype(S0) / days[:, None])
+        start += n
+    return averages
+
+
+def asian_payoffs(averages, strikes):
+    """Expected Asian swap, call and put payoffs and the probability of settling above, for every strike.
+
+    averages is (months, iterations) or (iterations,). Each month is sorted once;
+    with running sums of the sorted averages every strike is then one binary
+    search, so the cost barely grows with the number of strikes.
+    """
+    averages = np.atleast_2d(averages)
+    strikes = np.asarray(strikes, dtype=float)
+    n = averages.shape[1]
+    ordered = np.sort(averages, axis=1)
+    running = np.concatenate([np.zeros((len(ordered), 1)), np.cumsum(ordered, axis=1, dtype=np.float64)], axis=1)
+    at_or_below = np.array([np.searchsorted(row, strikes, side="right") for row in ordered])
+    sum_below = np.take_along_axis(running, at_or_below, axis=1)
+    sum_above = running[:, -1:] - sum_below
+    above = n - at_or_below
+    return AsianPayoffs(
+        swap=running[:, -1:] / n - strikes,
+        call=(sum_above - strikes * above) / n,
+        put=(strikes * at_or_below - sum_below) / n,
+        above=above / n,
+    )
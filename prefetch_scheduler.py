@@ -0,0 +1,227 @@
+"""Background prefetch scheduler for the dashboard's local caches.
+
+Run it next to the Streamlit app:
+
+    python prefetch_scheduler.py            # refresh each source just after its releases, forever
+    python prefetch_scheduler.py --once     # refresh every source now and exit
+    python prefetch_scheduler.py --status   # print last refresh / next due time per source
+
+While its heartbeat is fresh, page renders serve the caches as they are and
+never wait on the network; see local_store.background_refresh_active.
+"""
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from eia_client import STEO_URL, SNDW_URL, steo_params, sndw_params
+from eia_store import load_series
+from financial_markets_page import equity_tickers, fx_tickers
+from fundamentals_page import annual_series_ids, inventory_plus_series, monthly_production_components
+from gpr_store import load_gpr
+from local_store import SCHEDULER_STATUS, read_scheduler_status
+from price_store import HISTORY_START, load_close
+from treasury_store import load_yield_curve
+
+EASTERN = ZoneInfo("America/New_York")
+
+# Refresh this long after a scheduled release, so the publisher has time to post it
+RELEASE_GRACE = timedelta(minutes=15)
+
+# Longest single sleep; keeps the heartbeat well inside HEARTBEAT_TIMEOUT
+HEARTBEAT_INTERVAL = 5 * 60
+
+# A failed refresh is retried after this long instead of waiting for the next release
+RETRY_AFTER = timedelta(minutes=15)
+
+# Forces a store to go to the network regardless of how fresh its copy is
+FORCE = timedelta(0)
+
+
+def _at(day, hour, minute):
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=EASTERN)
+
+
+def next_weekly_petroleum(after):
+    # Weekly Petroleum Status Report: Wednesdays 10:30 ET
+    day = after.astimezone(EASTERN).date()
+    for offset in range(8):
+        release = _at(day + timedelta(days=offset), 10, 30)
+        if release.weekday() == 2 and release > after:
+            return release
+
+
+def next_steo(after):
+    # Short-Term Energy Outlook: the Tuesday after the first Thursday of the month, 12:00 ET
+    local = after.astimezone(EASTERN)
+    year, month = local.year, local.month
+    while True:
+        first = date(year, month, 1)
+        first_thursday = first + timedelta(days=(3 - first.weekday()) % 7)
+        release = _at(first_thursday + timedelta(days=5), 12, 0)
+        if release > after:
+            return release
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def business_days_at(hour, minute):
+    def next_release(after):
+        day = after.astimezone(EASTERN).date()
+        for offset in range(8):
+            release = _at(day + timedelta(days=offset), hour, minute)
+            if release.weekday() < 5 and release > after:
+                return release
+    return next_release
+
+
+def previous_release(next_release, now):
+    # Walk forward from well before now; the last release not after now wins
+    release = next_release(now - timedelta(days=45))
+    previous = None
+    while release <= now:
+        previous = release
+        release = next_release(release)
+    return previous
+
+
+def _check_refreshed(data, started, what):
+    # The stores print a failed download and serve the stored copy, so a copy
+    # not written (or revalidated) since the refresh started means it failed
+    refreshed_at = None if data is None else data.attrs.get("refreshed_at")
+    if not refreshed_at or refreshed_at < started:
+        raise RuntimeError(f"{what}: nothing new was stored")
+
+
+def _refresh_eia_weekly():
+    started = time.time()
+    start = (datetime.now() - timedelta(days=5*365)).strftime("%Y-%m-%d")
+    weekly = load_series(SNDW_URL, sndw_params(start), list(inventory_plus_series), facet="series", max_age=FORCE)
+    _check_refreshed(weekly, started, "EIA weekly petroleum data")
+
+
+def _refresh_steo():
+    started = time.time()
+    annual = load_series(STEO_URL, steo_params("annual", "2000"), annual_series_ids, max_age=FORCE)
+    monthly = load_series(STEO_URL, steo_params("monthly", "1998"), list(monthly_production_components), max_age=FORCE)
+    _check_refreshed(annual, started, "STEO annual series")
+    _check_refreshed(monthly, started, "STEO monthly series")
+
+
+def _refresh_treasury():
+    started = time.time()
+    # Last year is included so its final copy is taken (and marked closed) after new year
+    current_year = datetime.now().year
+    _check_refreshed(load_yield_curve([current_year - 1, current_year], max_age=FORCE), started, "Treasury yield curve")
+
+
+def _refresh_gpr():
+    started = time.time()
+    _check_refreshed(load_gpr(max_age=FORCE), started, "GPR file")
+
+
+def _refresh_prices():
+    started = time.time()
+    tickers = list(dict.fromkeys(list(equity_tickers) + list(fx_tickers)))
+    _check_refreshed(load_close(tickers, HISTORY_START, max_age=FORCE), started, "Yahoo Finance prices")
+
+
+Source = namedtuple("Source", ["description", "next_release", "refresh"])
+
+SOURCES = {
+    "eia_weekly": Source("EIA weekly petroleum (Wed 10:30 ET)", next_weekly_petroleum, _refresh_eia_weekly),
+    "steo": Source("EIA Short-Term Energy Outlook (monthly)", next_steo, _refresh_steo),
+    "treasury": Source("Treasury par yield curve (business days 18:00 ET)", business_days_at(18, 0), _refresh_treasury),
+    # The GPR file has no fixed calendar; a conditional GET costs a 304 when it is unchanged
+    "gpr": Source("Geopolitical Risk daily file (checked business days 06:00 ET)", business_days_at(6, 0), _refresh_gpr),
+    "prices": Source("Yahoo Finance daily bars (business days 18:30 ET)", business_days_at(18, 30), _refresh_prices),
+}
+
+
+def _write_status(status):
+    SCHEDULER_STATUS.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SCHEDULER_STATUS.with_name(SCHEDULER_STATUS.name + f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(status, indent=2))
+    os.replace(tmp_path, SCHEDULER_STATUS)
+
+
+def _first_due(source, entry, now):
+    # Due immediately when the last refresh predates the latest release
+    previous = previous_release(source.next_release, now)
+    last_refresh = entry.get("last_refresh")
+    if previous is not None and (last_refresh is None or datetime.fromisoformat(last_refresh) < previous + RELEASE_GRACE):
+        return now
+    return source.next_release(now) + RELEASE_GRACE
+
+
+def refresh(name, status):
+    source = SOURCES[name]
+    entry = status["sources"].setdefault(name, {})
+    started = time.monotonic()
+    try:
+        source.refresh()
+        entry["last_error"] = None
+    except Exception as err:
+        entry["last_error"] = f"{type(err).__name__}: {err}"
+        print(f"Refreshing {name} failed: {err}")
+    now = datetime.now(EASTERN)
+    entry["description"] = source.description
+    # last_refresh is when the stored copy was last brought up to date
+    if not entry["last_error"]:
+        entry["last_refresh"] = now.isoformat()
+    entry["duration_s"] = round(time.monotonic() - started, 2)
+    next_due = source.next_release(now) + RELEASE_GRACE
+    if entry["last_error"]:
+        next_due = min(next_due, now + RETRY_AFTER)
+    entry["next_due"] = next_due.isoformat()
+
+
+def run(once=False):
+    status = read_scheduler_status() or {}
+    status.setdefault("sources", {})
+    now = datetime.now(EASTERN)
+    due = {}
+    for name, source in SOURCES.items():
+        entry = status["sources"].setdefault(name, {"description": source.description})
+        due[name] = now if once else _first_due(source, entry, now)
+        entry["next_due"] = due[name].isoformat()
+
+    try:
+        while True:
+            now = datetime.now(EASTERN)
+            for name in SOURCES:
+                if due[name] <= now:
+                    refresh(name, status)
+                    due[name] = datetime.fromisoformat(status["sources"][name]["next_due"])
+            if once:
+                return status
+            status["heartbeat"] = time.time()
+            _write_status(status)
+            wait = min(due.values()) - datetime.now(EASTERN)
+            time.sleep(min(HEARTBEAT_INTERVAL, max(1.0, wait.total_seconds())))
+    finally:
+        # Renders go back to refreshing on their own as soon as the scheduler stops
+        status["heartbeat"] = 0
+        _write_status(status)
+
+
+def print_status(status):
+    for name, entry in (status or {}).get("sources", {}).items():
+        print(f"{name:<12} last refresh: {entry.get('last_refresh') or 'never':<34} "
+              f"next due: {entry.get('next_due') or '-':<34} {entry.get('last_error') or ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="refresh every source now and exit")
+    parser.add_argument("--status", action="store_true", help="print the refresh status and exit")
+    args = parser.parse_args()
+    if args.status:
+        print_status(read_scheduler_status())
+    else:
+        try:
+            print_status(run(once=args.once))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,156 @@
+import time
+from datetime import timedelta
+from urllib.parse import quote
+
+import pandas as pd
+import yfinance as yf
+
+import resilience
+from local_store import background_refresh_active, cache_path, file_lock, oldest_refresh, read_frame, write_frame
+
+# Every backfill goes at least this far back, so later pages asking for a
+# longer window than the first one still read locally
+HISTORY_START = pd.Timestamp("2000-01-01")
+
+# A stored ticker is read locally, without touching Yahoo, for this long
+REFRESH_AFTER = timedelta(minutes=15)
+
+# A top-up re-requests the last few stored bars; the newest one may have been
+# a partial intraday bar when it was saved
+OVERLAP = timedelta(days=5)
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+
+def _ticker_path(ticker):
+    # '^GSPC' -> '%5EGSPC.parquet', 'BZ=F' -> 'BZ%3DF.parquet'
+    return cache_path("prices", f"{quote(ticker, safe='')}.parquet")
+
+
+def _plan(stored, meta, start, max_age):
+    """Return the start to download from for one ticker, or None if the stored copy is enough."""
+    if stored is None or stored.empty or pd.Timestamp(meta.get("covered_from", start)) > start:
+        return min(start, HISTORY_START)
+    if max_age is None or time.time() - meta.get("refreshed_at", 0) < max_age.total_seconds():
+        return None
+    return stored['Date'].max() - OVERLAP
+
+
+def _split_download(data, tickers):
+    # yf.download returns (field, ticker) columns for several tickers and, depending
+    # on the yfinance version, flat or (field, ticker) columns for a single one
+    frames = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(-1):
+                continue
+            frame = data.xs(ticker, axis=1, level=-1)
+        else:
+            frame = data
+        frame = frame.reindex(columns=FIELDS).dropna(how='all')
+        frames[ticker] = frame.rename_axis('Date').reset_index()
+    return frames
+
+
+def _download(tickers, start):
+    # yf.download reports failed tickers on stdout and returns what it got; an
+    # empty frame is raised so retries and the circuit breaker see the failure
+    data = yf.download(tickers, start=start, auto_adjust=False, progress=False,
+                       timeout=resilience.POLICIES["prices"].timeout[1])
+    if data is None or data.empty:
+        raise ValueError(f"Yahoo returned no data for {', '.join(tickers)}")
+    return data
+
+
+def _upsert(stored, fresh):
+    if stored is None or stored.empty:
+        return fresh.sort_values('Date', ignore_index=True)
+    merged = pd.concat([stored, fresh], ignore_index=True)
+    merged = merged.drop_duplicates(subset='Date', keep='last')
+    return merged.sort_values('Date', ignore_index=True)
+
+
+def _load(tickers, start, max_age=REFRESH_AFTER, offline=False):
+    # While the prefetch scheduler is running it owns top-ups
+    if background_refresh_active() and max_age == REFRESH_AFTER:
+        max_age = None
+    paths = {ticker: _ticker_path(ticker) for ticker in tickers}
+    # Files are swapped in atomically, so offline reads need no lock
+    locks = [] if offline else [file_lock(paths[ticker]) for ticker in sorted(tickers)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        stored = {}
+        metas = {}
+        pending = {}
+        for ticker, path in paths.items():
+            frame, meta = read_frame(path)
+            stored[ticker] = frame
+            metas[ticker] = meta
+            download_start = None if offline else _plan(frame, meta, start, max_age)
+            if download_start is not None:
+                pending[ticker] = download_start
+
+        # Backfills share one yf.download call and top-ups share another, each
+        # starting from the earliest date its tickers need
+        groups = {}
+        for ticker, download_start in pending.items():
+            group = groups.setdefault(stored[ticker] is None or stored[ticker].empty, [download_start, []])
+            group[0] = min(group[0], download_start)
+            group[1].append(ticker)
+
+        for download_start, pending_tickers in groups.values():
+            try:
+                data = resilience.call("prices", resilience.YAHOO_HOST, _download, pending_tickers, download_start)
+            except Exception as err:
+                print(f"Failed to download {', '.join(pending_tickers)}: {err}")
+                continue
+            for ticker, fresh in _split_download(data, pending_tickers).items():
+                frame = _upsert(stored[ticker], fresh)
+                covered_from = min(pd.Timestamp(metas[ticker].get("covered_from", download_start)), download_start)
+                metas[ticker] = {"covered_from": str(covered_from), "refreshed_at": time.time()}
+                write_frame(frame, paths[ticker], metas[ticker])
+                stored[ticker] = frame
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+    return stored, metas
+
+
+def load_history(ticker, start, end=None, max_age=REFRESH_AFTER, offline=False):
+    """Return the stored OHLC history of one ticker indexed by Date; end is exclusive like yf.download.
+
+    offline=True returns the stored copy as it is, without waiting on a top-up
+    in progress. attrs["refreshed_at"] is the time of the last top-up.
+    """
+    start = pd.Timestamp(start)
+    stored, metas = _load([ticker], start, max_age, offline)
+    frame = stored[ticker]
+    if frame is None:
+        return pd.DataFrame(columns=FIELDS, index=pd.DatetimeIndex([], name='Date'))
+    frame = frame.set_index('Date')
+    mask = frame.index >= start
+    if end is not None:
+        mask &= frame.index < pd.Timestamp(end)
+    frame = frame[mask]
+    frame.attrs["refreshed_at"] = oldest_refresh(metas.values())
+    return frame
+
+
+def load_close(tickers, start, end=None, field='Adj Close', max_age=REFRESH_AFTER, offline=False):
+    """Return one price field for several tickers as a Date x ticker DataFrame."""
+    start = pd.Timestamp(start)
+    stored, metas = _load(list(tickers), start, max_age, offline)
+    columns = {
+        ticker: frame.set_index('Date')[field]
+        for ticker, frame in stored.items() if frame is not None
+    }
+    if not columns:
+        return pd.DataFrame(columns=list(tickers), index=pd.DatetimeIndex([], name='Date'))
+    data = pd.DataFrame(columns, columns=list(tickers)).sort_index()
+    mask = data.index >= start
+    if end is not None:
+        mask &= data.index < pd.Timestamp(end)
+    data = data[mask]
+    data.attrs["refreshed_at"] = oldest_refresh(metas.values())
+    return data
@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import requests
+
+# timeout: (connect, read) seconds per attempt; attempts: tries per call, retries
+# are spaced by full-jitter exponential backoff (base * 2**n, capped at max_backoff);
+# failure_threshold consecutive failed attempts against a host open its circuit,
+# which then fails calls immediately until reset_after seconds have passed
+Policy = namedtuple("Policy", ["timeout", "attempts", "backoff", "max_backoff", "failure_threshold", "reset_after"])
+
+POLICIES = {
+    "eia": Policy(timeout=(5, 30), attempts=3, backoff=0.5, max_backoff=8, failure_threshold=5, reset_after=120),
+    "prices": Policy(timeout=(5, 20), attempts=3, backoff=1.0, max_backoff=8, failure_threshold=4, reset_after=120),
+    "treasury": Policy(timeout=(5, 20), attempts=3, backoff=0.5, max_backoff=8, failure_threshold=4, reset_after=300),
+    "gpr": Policy(timeout=(5, 30), attempts=2, backoff=1.0, max_backoff=8, failure_threshold=3, reset_after=600),
+}
+
+# yf.download talks to several Yahoo hosts; they share one circuit
+YAHOO_HOST = "finance.yahoo.com"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one host.
+
+    Closed: calls go through. Open: calls fail at once. After reset_after
+    seconds one trial call is let through (half-open); its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold, reset_after):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+
+_breakers = {}
+_breakers_guard = threading.Lock()
+
+
+def breaker(host, source):
+    with _breakers_guard:
+        if host not in _breakers:
+            policy = POLICIES[source]
+            _breakers[host] = CircuitBreaker(policy.failure_threshold, policy.reset_after)
+        return _breakers[host]
+
+
+def _retryable(err):
+    # Client errors other than 429 Too Many Requests will not go away on a retry
+    response = getattr(err, "response", None)
+    if isinstance(err, requests.exceptions.HTTPError) and response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return True
+
+
+def call(source, host, fn, *args, **kwargs):
+    """Call fn with the source's retry policy and the host's circuit breaker.
+
+    Raises CircuitOpenError without calling fn while the host's circuit is open,
+    and the last error once every attempt has failed.
+    """
+    policy = POLICIES[source]
+    host_breaker = breaker(host, source)
+    for attempt in range(policy.attempts):
+        if not host_breaker.allow():
+            raise CircuitOpenError(f"{host} is failing; skipped until its circuit closes")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as err:
+            if not _retryable(err):
+                # The host answered, so it counts as up
+                host_breaker.record_success()
+                raise
+            host_breaker.record_failure()
+            if attempt + 1 == policy.attempts:
+                raise
+            time.sleep(random.uniform(0, min(policy.max_backoff, policy.backoff * 2 ** attempt)))
+        else:
+            host_breaker.record_success()
+            return result
+
+
+def get(source, url, session=None, **kwargs):
+    """requests.get with the source's timeout, retries and circuit breaker; raises on HTTP errors."""
+    def attempt():
+        response = (session or requests).get(url, timeout=POLICIES[source].timeout, **kwargs)
+        response.raise_for_status()
+        return response
+    return call(source, urlparse(url).netloc, attempt)
@@ -0,0 +1,149 @@
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+
+from mc_engine import PathSketch
+
+# The page's figures: quantiles shown as metrics, VaR levels (below 0.5 the lower
+# tail, above it the upper tail) and the per-step bands of the key paths chart
+QUANTILES = (0.30, 0.80)
+VAR_LEVELS = (0.01, 0.05, 0.95, 0.99)
+BANDS = (0.30, 0.80)
+
+# "terminal": prices at the forecast end date only; "pooled": every step of every
+# path together, as the page used to do with np.percentile over the whole matrix
+DISTRIBUTIONS = ("terminal", "pooled")
+
+# quantiles, var and cvar map each requested level to a price; bands maps each band
+# level to an array of one price per step; mean_path is the mean price per step
+RiskSummary = namedtuple("RiskSummary", ["distribution", "count", "mean", "quantiles", "var", "cvar", "bands", "mean_path"])
+
+
+def summarize(paths, distribution="terminal", quantiles=QUANTILES, var_levels=VAR_LEVELS, bands=BANDS):
+    """Every risk figure of a simulation in one pass over its prices.
+
+    paths is a PathSketch or a (steps, iterations) price array. CVaR at a
+    level is the mean price in the tail beyond that level's VaR. Terminal
+    figures of a sketch with a control variate are corrected by it: each
+    estimate moves against the control's error (its estimate against its
+    exact value) by a regression coefficient estimated from the paths.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"distribution must be one of {DISTRIBUTIONS}, not {distribution!r}")
+    levels = np.unique(np.concatenate([np.asarray(quantiles, dtype=float), np.asarray(var_levels, dtype=float)]))
+    if isinstance(paths, PathSketch):
+        counts = paths.counts[-1] if distribution == "terminal" else paths.counts.sum(axis=0)
+        values, tails = _sketch_tails(paths, counts, levels)
+        mean = paths.sums[-1] / paths.count if distribution == "terminal" else paths.mean
+        if distribution == "terminal" and paths.control is not None:
+            control_values, control_tails = _sketch_tails(paths, paths.control_counts, levels)
+            exact_values, exact_tails, exact_mean = _lognormal(paths.S0, *paths.control, levels)
+            quantile_beta, mean_beta = _control_coefficients(paths, levels)
+            # Quantiles and tail means are corrected in log price, the mean in price
+            values = values * (exact_values / control_values) ** quantile_beta
+            tails = tails * (exact_tails / control_tails) ** quantile_beta
+            mean = mean - mean_beta * (paths.control_moments[0] / paths.count - exact_mean)
+        count = int(round(counts.sum()))
+        band_paths = paths.quantile_paths(bands) if len(bands) else np.empty((0, paths.steps))
+        mean_path = paths.mean_path
+    else:
+        prices = paths[-1] if distribution == "terminal" else paths.ravel()
+        values, tails = _array_tails(prices, levels)
+        mean = prices.mean(dtype=np.float64)
+        count = prices.size
+        band_paths = np.quantile(paths, bands, axis=1) if len(bands) else np.empty((0, len(paths)))
+        mean_path = paths.mean(axis=1, dtype=np.float64)
+
+    by_level = dict(zip(levels.tolist(), values.tolist()))
+    tail_by_level = dict(zip(levels.tolist(), tails.tolist()))
+    return RiskSummary(
+        distribution=distribution,
+        count=count,
+        mean=float(mean),
+        quantiles={q: by_level[float(q)] for q in quantiles},
+        var={level: by_level[float(level)] for level in var_levels},
+        cvar={level: tail_by_level[float(level)] for level in var_levels},
+        bands=dict(zip(bands, band_paths)),
+        mean_path=mean_path,
+    )
+
+
+def _array_tails(prices, levels):
+    # One partition at every index the quantiles interpolate between; afterwards each
+    # tail is a contiguous slice, so CVaR is a prefix or suffix sum of it
+    n = prices.size
+    ranks = levels * (n - 1)
+    below, above = np.floor(ranks).astype(np.int64), np.ceil(ranks).astype(np.int64)
+    part = np.partition(prices, np.unique(np.concatenate([below, above])))
+    values = part[below] + (ranks - below) * (part[above] - part[below])
+    cumulative = np.concatenate([[0.0], np.cumsum(part, dtype=np.float64)])
+    tails = np.empty(len(levels))
+    for i, (level, low, high) in enumerate(zip(levels, below, above)):
+        if level < 0.5:
+            tails[i] = cumulative[low + 1] / (low + 1)
+        else:
+            tails[i] = (cumulative[n] - cumulative[high]) / (n - high)
+    return values, tails
+
+
+def _sketch_tails(sketch, counts, levels):
+    # Quantiles from the histogram; tail means weight each bucket's mid-price by the
+    # part of its count that falls inside the tail
+    values = sketch._quantiles(counts, levels)
+    total = counts.sum()
+    prices = sketch.S0 * np.exp((np.arange(len(counts)) - sketch.offset + 0.5) * sketch.width)
+    from_bottom = np.cumsum(counts) - counts
+    from_top = total - np.cumsum(counts)
+    lower = np.clip(levels[:, None] * total - from_bottom, 0, counts)
+    upper = np.clip((1 - levels[:, None]) * total - from_top, 0, counts)
+    weights = np.where(levels[:, None] < 0.5, lower, upper)
+    tails = (weights * prices).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-12)
+    return values, tails
+
+
+def _lognormal(S0, mean, stdev, levels):
+    # Quantiles, tail means and mean of S0 * exp(mean + stdev * Z)
+    normal = NormalDist()
+    expected = S0 * np.exp(mean + stdev ** 2 / 2)
+    z = np.array([normal.inv_cdf(level) for level in levels])
+    below = np.array([normal.cdf(value - stdev) for value in z])
+    values = S0 * np.exp(mean + stdev * z)
+    tails = np.where(levels < 0.5, expected * below / levels, expected * (1 - below) / (1 - levels))
+    return values, tails, expected
+
+
+def _control_coefficients(sketch, levels):
+    # Regression coefficients of the final price's estimates on the control's. For the
+    # mean it is Cov(X, C) / Var(C). For the quantile at level p, with the final and
+    # control log returns taken as bivariate normal with correlation rho, it is
+    # (sd(Y) / sd(L)) * (Phi2(z, z; rho) - p^2) / (p (1 - p)), z the normal p-quantile;
+    # tail means use the same coefficient as their quantile
+    C, CC, XC, L, Y, LL, YY, LY = sketch.control_moments / sketch.count
+    X = sketch.sums[-1] / sketch.count
+    mean_beta = (XC - X * C) / max(CC - C * C, 1e-300)
+    var_L, var_Y = max(LL - L * L, 1e-300), max(YY - Y * Y, 0.0)
+    rho = np.clip((LY - L * Y) / np.sqrt(var_L * max(var_Y, 1e-300)), -0.999, 1.0)
+    # Phi2(z, z; rho) - p^2 is the integral of exp(-z^2 / (1 + sin t)) / (2 pi) over t in [0, arcsin rho]
+    z = np.array([NormalDist().inv_cdf(level) for level in levels])
+    t = np.linspace(0.0, np.arcsin(rho), 257)
+    density = np.exp(-z[:, None] ** 2 / (1 + np.sin(t))) / (2 * np.pi)
+    joint = (density[:, 1:] + density[:, :-1]).sum(axis=1) * (t[1] - t[0]) / 2
+    quantile_beta = np.sqrt(var_Y / var_L) * joint / (levels * (1 - levels))
+    return quantile_beta, mean_beta
+
+
+def joint_probability(final, below=None, above=None):
+    """(probability, standard error) that every column in below ends under its
+    threshold and every column in above ends over it.
+
+    final is an (iterations, assets) array of final prices, e.g. from
+    mc_engine.simulate_joint; below and above map column index to a price.
+    """
+    hit = np.ones(len(final), dtype=bool)
+    for column, threshold in (below or {}).items():
+        hit &= final[:, column] < threshold
+    for column, threshold in (above or {}).items():
+        hit &= final[:, column] > threshold
+    probability = hit.mean()
+    return probability, np.sqrt(probability * (1 - probability) / len(final))
@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import streamlit as st
+
+# Seconds one render waits for each source before falling back to the stored snapshot.
+# The clock for a source starts at its first load in the render, so a page that
+# starts all its loads up front waits at most this long per source in total.
+RENDER_BUDGET = {
+    "eia": 2.0,
+    "prices": 1.5,
+    "treasury": 1.5,
+    "gpr": 1.5,
+}
+
+SOURCE_NAMES = {
+    "eia": "EIA",
+    "prices": "Yahoo Finance",
+    "treasury": "U.S. Treasury",
+    "gpr": "Geopolitical Risk",
+}
+
+MAX_WORKERS = 8
+
+# Revalidations outlive the render that started them; later renders join them
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="revalidate")
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _revalidate(load, args, kwargs):
+    # One background load per (loader, arguments), shared by every render and session
+    key = (getattr(load, "__qualname__", repr(load)), repr(args), repr(sorted(kwargs.items())))
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        future = _executor.submit(load, *args, **kwargs)
+        _inflight[key] = future
+    # Outside the lock: a load that has already finished runs the callback right here
+    future.add_done_callback(lambda done: _forget(key, done))
+    return future
+
+
+def _forget(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _is_empty(data):
+    return data is None or getattr(data, "empty", False)
+
+
+def format_age(seconds):
+    if seconds < 90:
+        return "a minute"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.0f} minutes"
+    if seconds < 36 * 3600:
+        return f"{seconds / 3600:.0f} hours"
+    return f"{seconds / 86400:.0f} days"
+
+
+class _Served:
+    # Future-like handle; .result() returns fresh data or the stored snapshot at the deadline
+    def __init__(self, budget, source, future, load, args, kwargs):
+        self._budget = budget
+        self._source = source
+        self._future = future
+        self._load = load
+        self._args = args
+        self._kwargs = kwargs
+        self._done = False
+        self._data = None
+
+    def result(self):
+        if not self._done:
+            self._data = self._budget._resolve(self._source, self._future, self._load, self._args, self._kwargs)
+            self._done = True
+        return self._data
+
+
+class RenderBudget:
+    """Stale-while-revalidate serving with one render deadline per source.
+
+    Loads run in the background. Whatever has not finished by its source's
+    deadline is served from the local store as it is, with a note giving its age,
+    and the load carries on so the next render picks up the fresh copy. Only
+    when nothing is stored yet does a render wait for the upstream.
+    """
+
+    def __init__(self, budgets=None):
+        self._budgets = dict(RENDER_BUDGET, **(budgets or {}))
+        self._deadlines = {}
+
+    def submit(self, source, load, *args, **kwargs):
+        """Start (or join) load(*args, **kwargs); load must accept offline=True for the stored snapshot."""
+        self._deadlines.setdefault(source, time.monotonic() + self._budgets[source])
+        return _Served(self, source, _revalidate(load, args, kwargs), load, args, kwargs)
+
+    def serve(self, source, load, *args, **kwargs):
+        return self.submit(source, load, *args, **kwargs).result()
+
+    def _resolve(self, source, future, load, args, kwargs):
+        timeout = max(0.0, self._deadlines[source] - time.monotonic())
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            pass
+        except Exception as err:
+            print(f"Loading {SOURCE_NAMES.get(source, source)} data failed: {err}")
+
+        snapshot = load(*args, offline=True, **kwargs)
+        if _is_empty(snapshot) and not future.done():
+            # Nothing stored yet, so there is nothing better to show than the upstream
+            try:
+                return future.result()
+            except Exception as err:
+                print(f"Loading {SOURCE_NAMES.get(source, source)} data failed: {err}")
+                return snapshot
+
+        if future.done() and future.exception() is None:
+            # Finished just after the deadline
+            return future.result()
+        name = SOURCE_NAMES.get(source, source)
+        refreshed_at = getattr(snapshot, "attrs", {}).get("refreshed_at")
+        stored = f"the stored {name} snapshot from {format_age(time.time() - refreshed_at)} ago" if refreshed_at else f"the stored {name} data"
+        if not future.done():
+            if refreshed_at:
+                st.caption(f"Showing {stored}; a refresh is running in the background.")
+        else:
+            # The load failed, so nothing is refreshing until a later render tries again
+            st.caption(f"Refreshing the {name} data failed; showing {stored}.")
+        return snapshot
@@ -0,0 +1,180 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import streamlit as st
+
+from mc_engine import SimulationCancelled
+
+# Simulations running at once across every session; the rest wait in the queue.
+# Each running job already spreads its paths over every core (mc_engine's
+# process pool), so a small number keeps the machine busy without thrashing.
+MAX_RUNNING_JOBS = 2
+
+# How often a waiting render redraws its progress bar
+POLL_INTERVAL = 0.25
+
+# Memory kept for finished simulation results across all sessions
+RESULT_CACHE_BYTES = int(os.environ.get("SIMULATION_CACHE_MB", "512")) * 2 ** 20
+
+
+class SimulationJob:
+    """One queued simulation; shared by every session that asked for the same thing."""
+
+    def __init__(self, key):
+        self.key = key
+        self.status = "queued"
+        self.progress = 0.0
+        self.submitted_at = time.time()
+        self.cancelled = threading.Event()
+        self.future = None
+        self._watchers = 0
+
+    def _report(self, fraction):
+        self.progress = fraction
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class SimulationQueue:
+    """A fixed pool of job threads shared by all sessions.
+
+    submit() with the key of a job that is still queued or running joins that
+    job instead of starting another. A job is cancelled once every session
+    watching it has released it; a later submit() of its key starts a new job
+    rather than joining the one winding down.
+    """
+
+    def __init__(self, max_running=MAX_RUNNING_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="simulation")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue fn(*args, progress=..., cancelled=..., **kwargs), or join the in-flight job with this key."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.done() or job.cancelled.is_set():
+                job = SimulationJob(key)
+                job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+                self._jobs[key] = job
+            job._watchers += 1
+            return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled.is_set():
+            raise SimulationCancelled()
+        job.status = "running"
+        try:
+            result = fn(*args, progress=job._report, cancelled=job.cancelled, **kwargs)
+        except SimulationCancelled:
+            job.status = "cancelled"
+            raise
+        except Exception:
+            job.status = "failed"
+            raise
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+        job.status = "done"
+        job.progress = 1.0
+        return result
+
+    def release(self, job):
+        # The last session to stop waiting on an unfinished job cancels it
+        with self._lock:
+            job._watchers -= 1
+            if job._watchers > 0 or job.done():
+                return
+            job.cancelled.set()
+            if job.future.cancel():
+                job.status = "cancelled"
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def status(self):
+        with self._lock:
+            return [(job.key, job.status, job.progress) for job in self._jobs.values()]
+
+
+class ResultCache:
+    """Least-recently-used results, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _size(value):
+        return getattr(value, "nbytes", None) or sys.getsizeof(value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+
+
+SIMULATIONS = SimulationQueue()
+RESULTS = ResultCache()
+
+
+def run_simulation_job(key, fn, *args, cancel_key=None, **kwargs):
+    """Run fn on the shared queue and wait for it with a progress bar; None if it was cancelled.
+
+    Results are cached under key, so a repeated request from any session
+    returns at once. The render only sleeps while waiting, so other sessions
+    keep rendering. The Cancel button, or any other widget change, reruns the
+    script; that stops the wait and releases the job, which is then cancelled
+    unless another session is waiting for the same result. The rerun made by
+    the Cancel button returns None without asking for the job again, so the
+    page should clear its run state then.
+    """
+    if cancel_key is not None and st.session_state.get(cancel_key):
+        return None
+    cached = RESULTS.get(key)
+    if cached is not None:
+        return cached
+    job = SIMULATIONS.submit(key, fn, *args, **kwargs)
+    try:
+        cancel_slot = st.empty()
+        cancel_slot.button("Cancel simulation", key=cancel_key)
+        bar = st.progress(0.0, text="Queued...")
+        while not job.done():
+            text = "Queued..." if job.status == "queued" else f"Simulating... {job.progress:.0%}"
+            bar.progress(min(job.progress, 1.0), text=text)
+            time.sleep(POLL_INTERVAL)
+        cancel_slot.empty()
+        bar.empty()
+        try:
+            result = job.result()
+        except (SimulationCancelled, CancelledError):
+            return None
+        RESULTS.put(key, result)
+        return result
+    finally:
+        SIMULATIONS.release(job)
@@ -1,9 +1,5 @@
 import streamlit as st
-from main_page import main_page
-from macro_economic_page import macro_economic_page
-from fundamentals_page import fundamentals_page
-from financial_markets_page import financial_markets_page
-from technical_probability_page import technical_probability_page
+from local_store import read_scheduler_status
 
 # Streamlit app layout
 st.set_page_config(page_title="Oil Indicator Dashboard", layout="wide")
@@ -15,14 +11,31 @@ st.title("Oil Indicator Dashboard")
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Main", "Macro-economic", "Fundamentals", "Financial Markets", "Technical and Probability Analysis"])
 
-# Render selected page
+# Last refresh and next due time per source, as kept by prefetch_scheduler.py
+scheduler_status = read_scheduler_status()
+if scheduler_status:
+    with st.sidebar.expander("Data refresh"):
+        for name, entry in scheduler_status.get("sources", {}).items():
+            last_refresh = (entry.get("last_refresh") or "never")[:16].replace("T", " ")
+            next_due = (entry.get("next_due") or "-")[:16].replace("T", " ")
+            failed = " · last attempt failed" if entry.get("last_error") else ""
+            st.caption(f"**{entry.get('description', name)}**  \nLast: {last_refresh} · Next: {next_due}{failed}")
+
+# Render selected page. Page modules are imported only when their page is
+# selected, so a new session does not pay for yfinance, scipy, pyarrow etc.
+# until a page needs them (Python keeps each module once it is loaded).
 if page == "Main":
+    from main_page import main_page
     main_page()
 elif page == "Macro-economic":
+    from macro_economic_page import macro_economic_page
     macro_economic_page()
 elif page == "Fundamentals":
+    from fundamentals_page import fundamentals_page
     fundamentals_page()
 elif page == "Financial Markets":
+    from financial_markets_page import financial_markets_page
     financial_markets_page()
 elif page == "Technical and Probability Analysis":
+    from technical_probability_page import technical_probability_page
     technical_probability_page()
@@ -0,0 +1,6 @@
+import streamlit as st
+
+# A fragment reruns on its own when one of its widgets changes, instead of the
+# whole page script. st.fragment needs Streamlit >= 1.37, the version pinned in
+# requirements.txt.
+fragment = st.fragment
@@ -1,9 +1,16 @@
 import streamlit as st
 import datetime
-import yfinance as yf
+from price_store import load_close, load_history
+from serving import RenderBudget
+from mc_engine import (block_bootstrap, fit_garch, joint_log_return_stats, log_return_stats, parallel_stream_paths,
+                       scenario_grid, simulate_joint)
+from sim_queue import run_simulation_job
+from risk_summary import joint_probability, summarize
+from payoffs import asian_payoffs, month_groups, stream_month_averages
+from backtest import TRADING_DAYS_PER_YEAR, coverage, run_backtest
+from financial_markets_page import equity_tickers, fx_tickers
 import numpy as np
 import plotly.express as px
-from scipy.stats import norm
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit.components.v1 as components
@@ -26,10 +33,48 @@ Monte Carlo simulation is a method used to estimate the future price of oil by c
 
 """
 
+# Horizons (days) and quantile levels of the scenario grid
+GRID_HORIZONS = [30, 60, 90, 180, 365, 730]
+GRID_LEVELS = {
+    "Lower VaR (1%)": 0.01,
+    "Lower VaR (5%)": 0.05,
+    "Quantile (30%)": 0.30,
+    "Median": 0.50,
+    "Quantile (80%)": 0.80,
+    "Upper VaR (95%)": 0.95,
+    "Upper VaR (99%)": 0.99,
+}
+
+# Tickers of the joint simulation: the Financial Markets page's equity indices and FX, Brent first
+JOINT_TICKERS = {**equity_tickers, **fx_tickers}
+
+# Sampling modes offered for the simulations (mc_engine.SAMPLINGS)
+SAMPLING_OPTIONS = {
+    "Pseudo-random": "standard",
+    "Antithetic variates": "antithetic",
+    "Sobol quasi-random (rounds paths up to a power of two)": "sobol",
+}
+
+# Path models offered in the Monte Carlo tabs
+MODEL_OPTIONS = {
+    "GBM (constant drift and volatility)": "gbm",
+    "Block bootstrap of historical returns": "bootstrap",
+    "GARCH(1,1)": "garch",
+}
+
+@st.cache_data
+def path_model(model, log_returns):
+    # None for GBM, else the mc_engine model fitted to the historical log returns
+    if model == "bootstrap":
+        return block_bootstrap(log_returns)
+    if model == "garch":
+        return fit_garch(log_returns)
+    return None
+
 def technical_probability_page():
     st.header("Technical and Probability Analysis",help= monte_carlo_explanation)
 
-    tab1,tab2,tab3 = st.tabs(['Technical Analysis','MonteCarlo Analysis (Daily)','MonteCarlo Analysis (Monthly)'])
+    tab1,tab2,tab3,tab4,tab5,tab6 = st.tabs(['Technical Analysis','MonteCarlo Analysis (Daily)','MonteCarlo Analysis (Monthly)','Scenario Grid (Daily)','Joint MonteCarlo (Multi-Asset)','VaR Backtest'])
 
     with tab1:
         st.subheader("TradingView Technical Analysis")
@@ -95,46 +140,60 @@ def technical_probability_page():
         # Inputs for the simulation
         today = datetime.date.today()
         end_date = st.date_input("Select current date", today - datetime.timedelta(days=1), max_value=today - datetime.timedelta(days=1), key="end_date_input")
-        future_end_date = st.date_input("Select future end date", datetime.date(2024, 12, 31), min_value= end_date + datetime.timedelta(days=1), key="future_date_input")
+        future_end_date = st.date_input("Select future end date", max(datetime.date(today.year, 12, 31), end_date + datetime.timedelta(days=1)), min_value= end_date + datetime.timedelta(days=1), key="future_date_input")
         # Streamlit slider for selecting the number of years of historical data
         years_of_data = st.slider('Select number of years of historical data:', min_value=1, max_value=10, value=10, key="years_of_data_2") 
+        # Paths are simulated in chunks and summarised as they go, so memory does not grow with this
+        iterations = st.select_slider('Number of simulated paths:', options=[10000, 100000, 1000000, 2000000], value=10000, key="iterations_2")
+        seed = st.number_input('Random seed:', min_value=0, value=42, step=1, key="seed_2")
+        path_model_name = MODEL_OPTIONS[st.selectbox('Path model:', list(MODEL_OPTIONS), key="model_2")]
+        # The bootstrap resamples historical returns, so there are no normals to vary
+        normals = path_model_name != "bootstrap"
+        # Variance reduction: tighter estimates from the same number of paths
+        sampling = SAMPLING_OPTIONS[st.selectbox('Sampling:', list(SAMPLING_OPTIONS), key="sampling_2", disabled=not normals)]
+        # Under GBM the control would be the final price itself, so it only corrects GARCH paths
+        control_variate = st.checkbox('Lognormal control variate (GARCH only)', value=False, key="control_variate_2", disabled=path_model_name != "garch")
+        if not normals:
+            sampling = "standard"
+        if path_model_name != "garch":
+            control_variate = False
 
         run_simulation = st.button("Run Simulation", key="RUN")
 
-        
-
+        # Results are cached by these parameters; while the inputs still match the
+        # last run, reruns (e.g. the CSV download) show its results again
+        model = f"{path_model_name}_daily/" + sampling + ("+cv" if control_variate else "")
+        simulation = ('BZ=F', end_date, future_end_date, years_of_data, iterations, model, int(seed))
         if run_simulation:
+            st.session_state["simulation_daily"] = simulation
+
+        if st.session_state.get("simulation_daily") == simulation:
             start_date = pd.Timestamp(end_date) - pd.DateOffset(years=years_of_data)
-            brent_data = yf.download('BZ=F', start=start_date, end=pd.Timestamp(end_date) + pd.Timedelta(days=1))
+            brent_data = RenderBudget().serve("prices", load_history, 'BZ=F', start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1))
 
             # Extract the 'Close' prices
             new_data = brent_data['Close']
 
-            # Historical log returns
-            log_returns = np.log(1 + new_data.pct_change())
-
-            # Drift = Average Daily Return − (Variance / 2)
-            u = log_returns.mean()
-            var = log_returns.var()
-            drift = u - (0.5 * var)
-
-            # Standard deviation of historic log returns
-            stdev = log_returns.std()
+            # Historical log returns, drift (average daily return − variance / 2) and their standard deviation
+            log_returns, drift, stdev = log_return_stats(new_data)
 
             # Price predictions for the specified future period with iterations
             last_date = new_data.index[-1]
             t_intervals = (pd.Timestamp(future_end_date) - last_date).days
-            iterations = 10000
-            daily_returns = np.exp(drift + stdev * norm.ppf(np.random.rand(t_intervals, iterations)))
 
             # Initial stock price
             S0 = new_data.iloc[-1]
-            price_list = np.zeros_like(daily_returns)
-            price_list[0] = S0
 
-            # Simulate price series
-            for t in range(1, t_intervals):
-                price_list[t] = price_list[t - 1] * daily_returns[t]
+            # Simulate price series (row 0 is S0) across the worker processes, keeping running summaries
+            # only. The run goes through the queue shared by all sessions and its result is cached.
+            price_list = run_simulation_job(simulation, parallel_stream_paths, S0, drift, stdev, t_intervals, iterations, seed=int(seed),
+                                            sampling=sampling, control_variate=control_variate,
+                                            model=path_model(path_model_name, log_returns.dropna()), cancel_key="CANCEL")
+            if price_list is None:
+                # Only a new Run click starts it again
+                st.session_state.pop("simulation_daily", None)
+                st.warning("The simulation was cancelled.")
+                st.stop()
 
             # Calculate daily, monthly, and annual volatility
             daily_volatility = log_returns.std()
@@ -143,19 +202,11 @@ def technical_probability_page():
             trading_days_per_year = 252  # Assuming 252 trading days in a year
             annual_volatility = daily_volatility * np.sqrt(trading_days_per_year)
 
-            # Calculate VaR
-            confidence_level = 0.05  # 5% confidence level
-            var = np.percentile(price_list, confidence_level * 100)
-
-            # Calculate VaR
-            confidence_level_3 = 0.01  # 1% confidence level
-            var_3 = np.percentile(price_list, confidence_level_3 * 100)
-
-            confidence_level_2 = 0.95  # 95% confidence level
-            var_2 = np.percentile(price_list, confidence_level_2 * 100)
-
-            confidence_level_4 = 0.99  # 95% confidence level
-            var_4 = np.percentile(price_list, confidence_level_4 * 100)
+            # Quantiles, VaR/CVaR and key paths in one pass over the results. The final-price
+            # figures describe the forecast date; pooling every day of every path mixes horizons
+            distribution = st.radio("Risk figures from:", ["Final prices", "All simulated prices"], horizontal=True, key="risk_distribution_2")
+            final = summarize(price_list, "terminal")
+            summary = final if distribution == "Final prices" else summarize(price_list, "pooled", bands=())
 
             st.subheader("Simulation Details & Results")
 
@@ -164,9 +215,9 @@ def technical_probability_page():
             with col1:
                 st.divider()
                 st.metric(label="Current Closing Price", value=round(S0, 2))
-                st.metric(label="Number of Iterations", value=iterations)
+                st.metric(label="Number of Iterations", value=price_list.count)
                 st.metric(label="Forecasted Period", value=future_end_date.strftime('%Y-%m-%d') + f" ({t_intervals} days)")
-                st.metric(label="Expected Average Price", value=round(np.mean(price_list), 2))
+                st.metric(label="Expected Average Price", value=round(summary.mean, 2))
                 @st.cache_data
                 def convert_df(df):
                     # IMPORTANT: Cache the conversion to prevent computation on every rerun
@@ -181,6 +232,7 @@ def technical_probability_page():
                     data=csv,
                     file_name="Brent_Price.csv",
                     mime="text/csv",
+                    key="download_daily",
     )
 
 
@@ -192,12 +244,12 @@ def technical_probability_page():
 
             with col3:
                 st.divider()
-                st.metric(label="Quantile (30%)", value=round(np.percentile(price_list, 30), 2))
-                st.metric(label="Quantile (80%)", value=round(np.percentile(price_list, 80), 2))
-                st.metric(label=f"Lower VaR (1% confidence level)", value=round(var_3, 2))
-                st.metric(label=f"Lower VaR (5% confidence level)", value=round(var, 2))
-                st.metric(label=f"Upper VaR (95% confidence level)", value=round(var_2, 2))
-                st.metric(label=f"Upper VaR (99% confidence level)", value=round(var_4, 2))
+                st.metric(label="Quantile (30%)", value=round(summary.quantiles[0.30], 2))
+                st.metric(label="Quantile (80%)", value=round(summary.quantiles[0.80], 2))
+                st.metric(label=f"Lower VaR (1% confidence level)", value=round(summary.var[0.01], 2), delta=f"CVaR {summary.cvar[0.01]:.2f}", delta_color="off")
+                st.metric(label=f"Lower VaR (5% confidence level)", value=round(summary.var[0.05], 2), delta=f"CVaR {summary.cvar[0.05]:.2f}", delta_color="off")
+                st.metric(label=f"Upper VaR (95% confidence level)", value=round(summary.var[0.95], 2), delta=f"CVaR {summary.cvar[0.95]:.2f}", delta_color="off")
+                st.metric(label=f"Upper VaR (99% confidence level)", value=round(summary.var[0.99], 2), delta=f"CVaR {summary.cvar[0.99]:.2f}", delta_color="off")
             
             #############################################
             col4, col5 = st.columns(2)
@@ -205,8 +257,10 @@ def technical_probability_page():
 
             with col4:
                 st.subheader("Monte Carlo Simulation of Brent Oil Prices - Histogram")
-                fig = px.histogram(price_list[-1], nbins=500, title='Distribution of Final Prices from Monte Carlo Simulation',
-                                labels={'value': 'Price', 'count': 'Frequency'})
+                # Final prices were binned while simulating; plot those bins
+                edges, counts = price_list.terminal_histogram(bins=500)
+                fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, name='Frequency'))
+                fig.update_layout(title='Distribution of Final Prices from Monte Carlo Simulation')
                 fig.update_layout(
                     xaxis_title='Price',
                     yaxis_title='Frequency',
@@ -215,11 +269,12 @@ def technical_probability_page():
                 )
                 
                 # Add lines for mean and median
-                mean_price = np.mean(price_list[-1])
+                mean_price = final.mean
                 fig.add_vline(x=mean_price, line_dash="dash", line_color="black", annotation_text="Mean", annotation_position="bottom")
 
-                Q30 =  round(np.percentile(price_list, 30), 2)
-                Q80 =  round(np.percentile(price_list, 80), 2)
+                # The histogram is of final prices, so its lines are too
+                Q30 =  round(final.quantiles[0.30], 2)
+                Q80 =  round(final.quantiles[0.80], 2)
                 
                 # Add annotations for VaR
                 fig.add_vline(x=Q30, line_dash="dash", line_color="red", annotation_text="Q30", annotation_position="top")
@@ -228,10 +283,10 @@ def technical_probability_page():
                 st.plotly_chart(fig)
 
                 st.subheader("Monte Carlo Simulation of Brent Oil Prices - Key Paths")
-                mean_path = np.mean(price_list, axis=1)
+                mean_path = final.mean_path
 
-                percentile_30_path = np.percentile(price_list, 30, axis=1)
-                percentile_80_path = np.percentile(price_list, 80, axis=1)
+                percentile_30_path = final.bands[0.30]
+                percentile_80_path = final.bands[0.80]
 
                 fig_key_paths = px.line(title='Monte Carlo Simulation Key Paths', labels={'index': 'Days', 'value': 'Price'})
                 fig_key_paths.add_scatter(x=list(range(t_intervals)), y=mean_path, mode='lines', name='Mean Path', line=dict(color='blue'))
@@ -267,33 +322,44 @@ def technical_probability_page():
         # Inputs for the simulation
         today = datetime.date.today()
         end_date = st.date_input("Select current date", today - datetime.timedelta(days=1), max_value=today - datetime.timedelta(days=1), key="end_date_input_2")
-        future_end_date = st.date_input("Select future end date", datetime.date(2024, 12, 31), min_value= end_date + datetime.timedelta(days=1), key="future_date_input_2")
+        future_end_date = st.date_input("Select future end date", max(datetime.date(today.year, 12, 31), end_date + datetime.timedelta(days=1)), min_value= end_date + datetime.timedelta(days=1), key="future_date_input_2")
         # Streamlit slider for selecting the number of years of historical data
         years_of_data = st.slider('Select number of years of historical data:', min_value=1, max_value=10, value=10, key="years_of_data") 
+        # Paths are simulated in chunks and summarised as they go, so memory does not grow with this
+        iterations = st.select_slider('Number of simulated paths:', options=[10000, 100000, 1000000, 2000000], value=10000, key="iterations")
+        seed = st.number_input('Random seed:', min_value=0, value=42, step=1, key="seed")
+        path_model_name = MODEL_OPTIONS[st.selectbox('Path model:', list(MODEL_OPTIONS), key="model")]
+        # The bootstrap resamples historical returns, so there are no normals to vary
+        normals = path_model_name != "bootstrap"
+        # Variance reduction: tighter estimates from the same number of paths
+        sampling = SAMPLING_OPTIONS[st.selectbox('Sampling:', list(SAMPLING_OPTIONS), key="sampling", disabled=not normals)]
+        # Under GBM the control would be the final price itself, so it only corrects GARCH paths
+        control_variate = st.checkbox('Lognormal control variate (GARCH only)', value=False, key="control_variate", disabled=path_model_name != "garch")
+        if not normals:
+            sampling = "standard"
+        if path_model_name != "garch":
+            control_variate = False
 
         run_simulation = st.button("Run Simulation", key="RUN_2")
 
-        
-
+        # Results are cached by these parameters; while the inputs still match the
+        # last run, reruns (e.g. the CSV download) show its results again
+        model = f"{path_model_name}_monthly/" + sampling + ("+cv" if control_variate else "")
+        simulation = ('BZ=F', end_date, future_end_date, years_of_data, iterations, model, int(seed))
         if run_simulation:
+            st.session_state["simulation_monthly"] = simulation
+
+        if st.session_state.get("simulation_monthly") == simulation:
             start_date = pd.Timestamp(end_date) - pd.DateOffset(years=years_of_data)
-            brent_data = yf.download('BZ=F', start=start_date, end=pd.Timestamp(end_date) + pd.Timedelta(days=1))
+            brent_data = RenderBudget().serve("prices", load_history, 'BZ=F', start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1))
 
             # Extract the 'Close' prices
             new_data = brent_data['Close']
             # Resample the data to get monthly closing prices
             monthly_data = brent_data['Close'].resample('M').last()
 
-            # Historical monthly log returns
-            log_returns_monthly = np.log(1 + monthly_data.pct_change())
-
-            # Drift = Average Monthly Return − (Variance / 2)
-            u_monthly = log_returns_monthly.mean()
-            var_monthly = log_returns_monthly.var()
-            drift_monthly = u_monthly - (0.5 * var_monthly)
-
-            # Standard deviation of historical monthly log returns
-            stdev_monthly = log_returns_monthly.std()           
+            # Historical monthly log returns, drift (average monthly return − variance / 2) and their standard deviation
+            log_returns_monthly, drift_monthly, stdev_monthly = log_return_stats(monthly_data)
 
             # Price predictions for the specified future period with iterations
             last_date = monthly_data.index[-1]
@@ -305,36 +371,30 @@ def technical_probability_page():
 
             # Then perform the subtraction
             t_intervals_monthly = (future_end_date_timestamp - last_date_timestamp).days // 30
-            iterations = 10000
-            monthly_returns = np.exp(drift_monthly + stdev_monthly * norm.ppf(np.random.rand(t_intervals_monthly, iterations)))
 
             # Initial stock price
             S0 = monthly_data.iloc[-1]
-            price_list_monthly = np.zeros_like(monthly_returns)
-            price_list_monthly[0] = S0
 
-            # Simulate price series
-            for t in range(1, t_intervals_monthly):
-                price_list_monthly[t] = price_list_monthly[t - 1] * monthly_returns[t]
+            # Simulate price series (row 0 is S0) across the worker processes, keeping running summaries
+            # only. The run goes through the queue shared by all sessions and its result is cached.
+            price_list_monthly = run_simulation_job(simulation, parallel_stream_paths, S0, drift_monthly, stdev_monthly, t_intervals_monthly, iterations, seed=int(seed),
+                                                    sampling=sampling, control_variate=control_variate,
+                                                    model=path_model(path_model_name, log_returns_monthly.dropna()), cancel_key="CANCEL_2")
+            if price_list_monthly is None:
+                st.session_state.pop("simulation_monthly", None)
+                st.warning("The simulation was cancelled.")
+                st.stop()
 
             # Calculate monthly and annual volatility
             monthly_volatility = stdev_monthly
             trading_months_per_year = 12  # 12 months in a year
             annual_volatility = monthly_volatility * np.sqrt(trading_months_per_year)
 
-            # Calculate VaR
-            confidence_level = 0.05  # 5% confidence level
-            var = np.percentile(price_list_monthly, confidence_level * 100)
-
-            # Calculate VaR
-            confidence_level_3 = 0.01  # 1% confidence level
-            var_3 = np.percentile(price_list_monthly, confidence_level_3 * 100)
-
-            confidence_level_2 = 0.95  # 95% confidence level
-            var_2 = np.percentile(price_list_monthly, confidence_level_2 * 100)
-
-            confidence_level_4 = 0.99  # 95% confidence level
-            var_4 = np.percentile(price_list_monthly, confidence_level_4 * 100)
+            # Quantiles, VaR/CVaR and key paths in one pass over the results. The final-price
+            # figures describe the forecast date; pooling every day of every path mixes horizons
+            distribution = st.radio("Risk figures from:", ["Final prices", "All simulated prices"], horizontal=True, key="risk_distribution")
+            final = summarize(price_list_monthly, "terminal")
+            summary = final if distribution == "Final prices" else summarize(price_list_monthly, "pooled", bands=())
 
             st.subheader("Simulation Details & Results")
 
@@ -343,9 +403,9 @@ def technical_probability_page():
             with col1:
                 st.divider()
                 st.metric(label="Current Closing Price", value=round(S0, 2))
-                st.metric(label="Number of Iterations", value=iterations)
+                st.metric(label="Number of Iterations", value=price_list_monthly.count)
                 st.metric(label="Forecasted Period", value=future_end_date.strftime('%Y-%m-%d') + f" ({t_intervals_monthly} Months)")
-                st.metric(label="Expected Average Price", value=round(np.mean(price_list_monthly), 2))
+                st.metric(label="Expected Average Price", value=round(summary.mean, 2))
                 @st.cache_data
                 def convert_df(df):
                     # IMPORTANT: Cache the conversion to prevent computation on every rerun
@@ -360,6 +420,7 @@ def technical_probability_page():
                     data=csv,
                     file_name="Brent_Price.csv",
                     mime="text/csv",
+                    key="download_monthly",
     )
 
 
@@ -370,12 +431,12 @@ def technical_probability_page():
 
             with col3:
                 st.divider()
-                st.metric(label="Quantile (30%)", value=round(np.percentile(price_list_monthly, 30), 2))
-                st.metric(label="Quantile (80%)", value=round(np.percentile(price_list_monthly, 80), 2))
-                st.metric(label=f"Lower VaR (1% confidence level)", value=round(var_3, 2))
-                st.metric(label=f"Lower VaR (5% confidence level)", value=round(var, 2))
-                st.metric(label=f"Upper VaR (95% confidence level)", value=round(var_2, 2))
-                st.metric(label=f"Upper VaR (99% confidence level)", value=round(var_4, 2))
+                st.metric(label="Quantile (30%)", value=round(summary.quantiles[0.30], 2))
+                st.metric(label="Quantile (80%)", value=round(summary.quantiles[0.80], 2))
+                st.metric(label=f"Lower VaR (1% confidence level)", value=round(summary.var[0.01], 2), delta=f"CVaR {summary.cvar[0.01]:.2f}", delta_color="off")
+                st.metric(label=f"Lower VaR (5% confidence level)", value=round(summary.var[0.05], 2), delta=f"CVaR {summary.cvar[0.05]:.2f}", delta_color="off")
+                st.metric(label=f"Upper VaR (95% confidence level)", value=round(summary.var[0.95], 2), delta=f"CVaR {summary.cvar[0.95]:.2f}", delta_color="off")
+                st.metric(label=f"Upper VaR (99% confidence level)", value=round(summary.var[0.99], 2), delta=f"CVaR {summary.cvar[0.99]:.2f}", delta_color="off")
             
             #############################################
             col4, col5 = st.columns(2)
@@ -383,8 +444,10 @@ def technical_probability_page():
 
             with col4:
                 st.subheader("Monte Carlo Simulation of Brent Oil Prices - Histogram")
-                fig = px.histogram(price_list_monthly[-1], nbins=500, title='Distribution of Final Prices from Monthly Average Monte Carlo Simulation',
-                                labels={'value': 'Price', 'count': 'Frequency'})
+                # Final prices were binned while simulating; plot those bins
+                edges, counts = price_list_monthly.terminal_histogram(bins=500)
+                fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, name='Frequency'))
+                fig.update_layout(title='Distribution of Final Prices from Monthly Average Monte Carlo Simulation')
                 fig.update_layout(
                     xaxis_title='Price',
                     yaxis_title='Frequency',
@@ -393,11 +456,12 @@ def technical_probability_page():
                 )
                 
                 # Add lines for mean and median
-                mean_price = np.mean(price_list_monthly[-1])
+                mean_price = final.mean
                 fig.add_vline(x=mean_price, line_dash="dash", line_color="black", annotation_text="Mean", annotation_position="bottom")
 
-                Q30 =  round(np.percentile(price_list_monthly, 30), 2)
-                Q80 =  round(np.percentile(price_list_monthly, 80), 2)
+                # The histogram is of final prices, so its lines are too
+                Q30 =  round(final.quantiles[0.30], 2)
+                Q80 =  round(final.quantiles[0.80], 2)
                 
                 # Add annotations for VaR
                 fig.add_vline(x=Q30, line_dash="dash", line_color="red", annotation_text="Q30", annotation_position="top")
@@ -406,10 +470,10 @@ def technical_probability_page():
                 st.plotly_chart(fig)
 
                 st.subheader("Monte Carlo Simulation of Brent Oil Prices for Monthly Average - Key Paths")
-                mean_path = np.mean(price_list_monthly, axis=1)
+                mean_path = final.mean_path
 
-                percentile_30_path = np.percentile(price_list_monthly, 30, axis=1)
-                percentile_80_path = np.percentile(price_list_monthly, 80, axis=1)
+                percentile_30_path = final.bands[0.30]
+                percentile_80_path = final.bands[0.80]
 
                 fig_key_paths = px.line(title='Monte Carlo Simulation Key Paths', labels={'index': 'Days', 'value': 'Price'})
                 fig_key_paths.add_scatter(x=list(range(t_intervals_monthly)), y=mean_path, mode='lines', name='Mean Path', line=dict(color='blue'))
@@ -440,4 +504,247 @@ def technical_probability_page():
 
 
             ############################################
+            st.subheader("Calendar-Month Average Prices and Asian Payoffs")
+            st.caption("Daily paths to the future end date, from daily returns with the same path model and sampling, "
+                       "averaged over each calendar month's simulated days. Payoffs are expected values, undiscounted.")
+
+            # Daily log returns, drift and their standard deviation, as in the daily tab
+            log_returns_daily, drift_daily, stdev_daily = log_return_stats(new_data)
+            S0_daily = new_data.iloc[-1]
+            dates = pd.date_range(new_data.index[-1], pd.Timestamp(future_end_date), freq='D')
+            months = [month.strftime('%b %Y') for month in month_groups(dates[1:])[0]]
+
+            averages_job = simulation[:5] + (simulation[5].replace("_monthly/", "_daily_month_average/"), simulation[6])
+            averages = run_simulation_job(averages_job, stream_month_averages, S0_daily, drift_daily, stdev_daily, dates, iterations,
+                                          seed=int(seed), sampling=sampling,
+                                          model=path_model(path_model_name, log_returns_daily.dropna()), cancel_key="CANCEL_AVG")
+            if averages is None:
+                st.session_state.pop("simulation_monthly", None)
+                st.warning("The simulation was cancelled.")
+                st.stop()
+
+            col6, col7 = st.columns(2)
+            with col6:
+                quantiles = np.quantile(averages, [0.05, 0.30, 0.50, 0.80, 0.95], axis=1).T
+                month_table = pd.DataFrame(quantiles, index=months, columns=["P5", "P30", "Median", "P80", "P95"])
+                month_table.insert(0, "Mean", averages.mean(axis=1))
+                st.dataframe(month_table.style.format("{:.2f}"))
+
+                fig_months = go.Figure()
+                fig_months.add_trace(go.Scatter(x=months, y=month_table["P95"], mode='lines', line=dict(width=0), showlegend=False))
+                fig_months.add_trace(go.Scatter(x=months, y=month_table["P5"], mode='lines', line=dict(width=0), fill='tonexty', name='P5-P95'))
+                fig_months.add_trace(go.Scatter(x=months, y=month_table["Mean"], mode='lines+markers', name='Mean', line=dict(color='blue')))
+                fig_months.update_layout(title="Distribution of Calendar-Month Average Prices", yaxis_title="Price", template='plotly_dark')
+                st.plotly_chart(fig_months)
+
+            with col7:
+                month = st.selectbox("Pricing month:", months, key="payoff_month")
+                low, high = st.slider("Strikes:", min_value=float(np.floor(month_table["P5"].min() * 0.8)), max_value=float(np.ceil(month_table["P95"].max() * 1.2)),
+                                      value=(float(np.floor(S0_daily * 0.8)), float(np.ceil(S0_daily * 1.2))), key="payoff_strikes")
+                strike_step = st.number_input("Strike step:", min_value=0.05, value=1.0, step=0.5, key="payoff_strike_step")
+                strikes = np.arange(low, high + strike_step / 2, strike_step)
+
+                # One sort of the month's averages prices every strike
+                payoffs = asian_payoffs(averages[months.index(month)], strikes)
+                payoff_table = pd.DataFrame({
+                    "Swap (average - strike)": payoffs.swap[0],
+                    "Call": payoffs.call[0],
+                    "Put": payoffs.put[0],
+                    "P(average > strike)": payoffs.above[0],
+                }, index=pd.Index(strikes, name="Strike"))
+                st.dataframe(payoff_table.style.format("{:.2f}").format("{:.1%}", subset=["P(average > strike)"]))
+
+                fig_payoffs = go.Figure()
+                fig_payoffs.add_trace(go.Scatter(x=strikes, y=payoffs.call[0], mode='lines', name='Asian call', line=dict(color='green')))
+                fig_payoffs.add_trace(go.Scatter(x=strikes, y=payoffs.put[0], mode='lines', name='Asian put', line=dict(color='red')))
+                fig_payoffs.update_layout(title=f"Expected Asian Option Payoffs, {month}", xaxis_title="Strike", yaxis_title="Payoff", template='plotly_dark')
+                st.plotly_chart(fig_payoffs)
+
+    with tab4:
+        st.subheader("Daily Monte Carlo over a grid of horizons and lookbacks")
+        st.caption("Every scenario uses the same random draws, so differences across the table come from "
+                   "the horizon and the lookback window, not from sampling noise.")
+        today = datetime.date.today()
+        end_date = st.date_input("Select current date", today - datetime.timedelta(days=1), max_value=today - datetime.timedelta(days=1), key="end_date_input_3")
+        horizons = st.multiselect('Horizons (days):', GRID_HORIZONS, default=[30, 90, 180, 365], key="grid_horizons")
+        lookbacks = st.multiselect('Years of historical data:', list(range(1, 11)), default=[1, 2, 3, 5, 10], key="grid_lookbacks")
+        iterations = st.select_slider('Number of simulated paths:', options=[10000, 100000, 1000000], value=100000, key="iterations_3")
+        seed = st.number_input('Random seed:', min_value=0, value=42, step=1, key="seed_3")
+        sampling = SAMPLING_OPTIONS[st.selectbox('Sampling:', list(SAMPLING_OPTIONS), key="sampling_3")]
+
+        run_simulation = st.button("Run Scenario Grid", key="RUN_3", disabled=not (horizons and lookbacks))
+
+        horizons, lookbacks = sorted(horizons), sorted(lookbacks)
+        simulation = ('BZ=F', end_date, tuple(horizons), tuple(lookbacks), iterations, "gbm_daily_grid/" + sampling, int(seed))
+        if run_simulation:
+            st.session_state["simulation_grid"] = simulation
+
+        if st.session_state.get("simulation_grid") == simulation:
+            # One download covers the longest lookback; shorter ones are its tail
+            start_date = pd.Timestamp(end_date) - pd.DateOffset(years=max(lookbacks))
+            brent_data = RenderBudget().serve("prices", load_history, 'BZ=F', start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1))
+            new_data = brent_data['Close']
+            S0 = new_data.iloc[-1]
+            stats = []
+            for years in lookbacks:
+                window = new_data[new_data.index >= pd.Timestamp(end_date) - pd.DateOffset(years=years)]
+                _, drift, stdev = log_return_stats(window)
+                stats.append((drift, stdev))
+
+            levels = list(GRID_LEVELS.values())
+            surface = run_simulation_job(simulation, scenario_grid, S0, stats, horizons, iterations, levels,
+                                         seed=int(seed), sampling=sampling, cancel_key="CANCEL_3")
+            if surface is None:
+                st.session_state.pop("simulation_grid", None)
+                st.warning("The simulation was cancelled.")
+                st.stop()
+
+            st.metric(label="Current Closing Price", value=round(S0, 2))
+            level = st.selectbox('Figure:', list(GRID_LEVELS), index=1, key="grid_level")
+            table = pd.DataFrame(surface[:, :, levels.index(GRID_LEVELS[level])],
+                                 index=pd.Index(lookbacks, name="Years of data"),
+                                 columns=pd.Index(horizons, name="Horizon (days)"))
+            st.dataframe(table.style.format("{:.2f}"))
+
+            fig_surface = go.Figure(go.Heatmap(z=table.values, x=[f"{h}d" for h in horizons], y=[f"{y}y" for y in lookbacks],
+                                               colorscale="RdYlGn", text=table.round(2).values, texttemplate="%{text}"))
+            fig_surface.update_layout(title=f"{level} by horizon and lookback", xaxis_title="Horizon", yaxis_title="Years of data", template='plotly_dark')
+            st.plotly_chart(fig_surface)
+
+    with tab5:
+        st.subheader("Joint Monte Carlo of Brent with the dollar and equity indices")
+        today = datetime.date.today()
+        end_date = st.date_input("Select current date", today - datetime.timedelta(days=1), max_value=today - datetime.timedelta(days=1), key="end_date_input_4")
+        future_end_date = st.date_input("Select future end date", max(datetime.date(today.year, 12, 31), end_date + datetime.timedelta(days=1)), min_value= end_date + datetime.timedelta(days=1), key="future_date_input_4")
+        years_of_data = st.slider('Select number of years of historical data:', min_value=1, max_value=10, value=5, key="years_of_data_4")
+        others = st.multiselect('Simulate Brent together with:', [ticker for ticker in JOINT_TICKERS if ticker != 'BZ=F'],
+                                default=['DX-Y.NYB', '^GSPC', '^GDAXI', '^N225'], format_func=JOINT_TICKERS.get, key="joint_tickers")
+        iterations = st.select_slider('Number of simulated paths:', options=[10000, 100000, 1000000], value=100000, key="iterations_4")
+        seed = st.number_input('Random seed:', min_value=0, value=42, step=1, key="seed_4")
+
+        run_simulation = st.button("Run Joint Simulation", key="RUN_4")
+
+        tickers = ['BZ=F'] + others
+        simulation = (tuple(tickers), end_date, future_end_date, years_of_data, iterations, "gbm_joint", int(seed))
+        if run_simulation:
+            st.session_state["simulation_joint"] = simulation
 
+        if st.session_state.get("simulation_joint") == simulation:
+            start_date = pd.Timestamp(end_date) - pd.DateOffset(years=years_of_data)
+            prices = RenderBudget().serve("prices", load_close, tickers, start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1))
+            prices = prices[tickers].dropna()
+            names = [JOINT_TICKERS[ticker] for ticker in tickers]
+
+            # Covariance of daily log returns on the days every market traded
+            drift, covariance = joint_log_return_stats(prices)
+            S0 = prices.iloc[-1].to_numpy()
+            t_intervals = (pd.Timestamp(future_end_date) - prices.index[-1]).days
+
+            try:
+                final = run_simulation_job(simulation, simulate_joint, S0, drift, covariance, t_intervals, iterations,
+                                           seed=int(seed), cancel_key="CANCEL_4")
+            except np.linalg.LinAlgError:
+                st.error("The selected markets move too closely together to simulate jointly; drop one of them.")
+                st.stop()
+            if final is None:
+                st.session_state.pop("simulation_joint", None)
+                st.warning("The simulation was cancelled.")
+                st.stop()
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.caption(f"Correlation of daily log returns ({len(prices)} common trading days)")
+                stdevs = np.sqrt(np.diag(covariance))
+                correlation = pd.DataFrame(covariance / np.outer(stdevs, stdevs), index=names, columns=names)
+                st.dataframe(correlation.style.format("{:.2f}"))
+            with col2:
+                st.caption(f"Simulated prices on {future_end_date.strftime('%Y-%m-%d')} ({t_intervals} days)")
+                quantiles = pd.DataFrame(np.quantile(final, [0.05, 0.5, 0.95], axis=0).T, index=names, columns=["P5", "Median", "P95"])
+                quantiles.insert(0, "Current", S0)
+                st.dataframe(quantiles.style.format("{:.2f}"))
+
+            st.subheader("Joint tail probability")
+            below, above = {}, {}
+            condition_cols = st.columns(len(tickers))
+            for column, (ticker, name) in enumerate(zip(tickers, names)):
+                with condition_cols[column]:
+                    condition = st.selectbox(name, ["Any", "Below", "Above"], index=1 if column == 0 else (2 if column == 1 else 0), key=f"joint_condition_{ticker}")
+                    default = quantiles.loc[name, "P5" if condition == "Below" else "P95"] if condition != "Any" else S0[column]
+                    threshold = st.number_input("Price", value=float(round(default, 2)), key=f"joint_threshold_{ticker}_{condition}", disabled=condition == "Any")
+                    if condition == "Below":
+                        below[column] = threshold
+                    elif condition == "Above":
+                        above[column] = threshold
+
+            probability, error = joint_probability(final, below, above)
+            marginals = np.prod([joint_probability(final, below={column: x})[0] for column, x in below.items()]
+                                + [joint_probability(final, above={column: x})[0] for column, x in above.items()])
+            col3, col4 = st.columns(2)
+            col3.metric(label="Joint probability", value=f"{probability:.2%}", delta=f"± {1.96 * error:.2%} (95% interval)", delta_color="off")
+            col4.metric(label="If the markets were independent", value=f"{marginals:.2%}")
+
+            if len(tickers) > 1:
+                shown = final[:5000]
+                fig_joint = px.scatter(x=shown[:, 0], y=shown[:, 1], opacity=0.3,
+                                       labels={'x': names[0], 'y': names[1]}, title=f"Simulated {names[0]} and {names[1]} (5,000 paths)")
+                fig_joint.update_layout(template='plotly_dark')
+                st.plotly_chart(fig_joint)
+
+    with tab6:
+        st.subheader("Rolling-origin backtest of the Monte Carlo VaR bands")
+        st.caption("From every origin in the stored Brent history, drift and volatility are estimated from the trailing "
+                   "window as on the daily tab, the bands are simulated as the daily tab draws them (one step per "
+                   "calendar day to the target date), and the price the horizon later is checked against them. "
+                   "A calibrated 5% band is breached at about 5% of origins.")
+        years_of_data = st.slider('Select number of years of historical data:', min_value=1, max_value=10, value=2, key="years_of_data_5")
+        horizon = st.select_slider('Horizon (trading days):', options=[5, 21, 63, 126, 252], value=21, key="backtest_horizon")
+        # Overlapping horizons share outcomes, so breaches cluster and the Kupiec test, which assumes
+        # independent breaches, rejects too often
+        non_overlapping = st.checkbox('Non-overlapping origins (one every horizon; needed for a valid Kupiec test)', value=True, key="backtest_non_overlapping")
+        iterations = st.select_slider('Number of simulated paths per origin:', options=[1000, 10000, 100000], value=10000, key="iterations_5")
+        seed = st.number_input('Random seed:', min_value=0, value=42, step=1, key="seed_5")
+
+        run_simulation = st.button("Run Backtest", key="RUN_5")
+
+        stride = horizon if non_overlapping else 1
+        simulation = ('BZ=F', years_of_data, horizon, stride, iterations, "gbm_backtest", int(seed))
+        if run_simulation:
+            st.session_state["simulation_backtest"] = simulation
+
+        if st.session_state.get("simulation_backtest") == simulation:
+            brent_data = RenderBudget().serve("prices", load_history, 'BZ=F', '2007-01-01')
+            close = brent_data['Close'].dropna()
+            window = years_of_data * TRADING_DAYS_PER_YEAR
+            if len(close) <= window + horizon:
+                st.error("The stored history is too short for this window and horizon.")
+                st.stop()
+
+            # The history grows every day, so its last date is part of the cached result's key
+            backtest_job = simulation[:1] + (close.index[-1],) + simulation[1:]
+            result = run_simulation_job(backtest_job, run_backtest, close, window, horizon, iterations,
+                                        stride=stride, seed=int(seed), cancel_key="CANCEL_5")
+            if result is None:
+                st.session_state.pop("simulation_backtest", None)
+                st.warning("The simulation was cancelled.")
+                st.stop()
+
+            table = coverage(result)
+            col1, col2, col3 = st.columns(3)
+            col1.metric(label="Forecast Origins", value=len(result.prices))
+            col2.metric(label="First Origin", value=pd.Timestamp(result.dates[0]).strftime('%Y-%m-%d'))
+            col3.metric(label="Last Origin", value=pd.Timestamp(result.dates[-1]).strftime('%Y-%m-%d'))
+            st.dataframe(table.style.format({"Expected rate": "{:.1%}", "Observed rate": "{:.2%}", "Kupiec LR": "{:.2f}", "p-value": "{:.3f}"}))
+            st.caption("Kupiec proportion-of-failures test: a p-value below 0.05 rejects the band's coverage at the 5% level.")
+
+            fig_backtest = go.Figure()
+            dates = pd.to_datetime(result.dates)
+            for column, level in enumerate(result.levels):
+                fig_backtest.add_trace(go.Scatter(x=dates, y=result.bands[:, column], mode='lines', name=f"{level:.0%} band",
+                                                  line=dict(dash='dash', width=1)))
+            fig_backtest.add_trace(go.Scatter(x=dates, y=result.realized, mode='lines', name=f'Price {horizon} days later', line=dict(color='white')))
+            outside = (result.realized < result.bands[:, 0]) | (result.realized > result.bands[:, -1])
+            fig_backtest.add_trace(go.Scatter(x=dates[outside], y=result.realized[outside], mode='markers', name='Outside the 1%-99% bands',
+                                              marker=dict(color='red', size=6)))
+            fig_backtest.update_layout(title="VaR Bands at Each Forecast Origin and the Realized Price", xaxis_title="Forecast origin",
+                                       yaxis_title="Price", template='plotly_dark')
+            st.plotly_chart(fig_backtest)
@@ -0,0 +1,59 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mc_engine import SimulationCancelled
+from sim_queue import SimulationQueue
+
+
+def gated(gate, progress=None, cancelled=None):
+    # Keeps running until the gate opens, then honours a cancel
+    gate.wait(5)
+    if cancelled.is_set():
+        raise SimulationCancelled()
+    return "done"
+
+
+def wait_running(job):
+    deadline = time.time() + 5
+    while job.status != "running" and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.status == "running"
+
+
+def test_submit_after_last_watcher_released_starts_a_new_job():
+    queue = SimulationQueue(max_running=2)
+    gate = threading.Event()
+    first = queue.submit("key", gated, gate)
+    wait_running(first)
+    # The only watcher leaves: the job is cancelled but still winding down
+    queue.release(first)
+    assert first.cancelled.is_set() and not first.done()
+
+    second = queue.submit("key", gated, gate)
+    assert second is not first
+    assert not second.cancelled.is_set()
+    gate.set()
+    assert second.result() == "done"
+    with pytest.raises(SimulationCancelled):
+        first.result()
+    # The old job finishing must not drop the new one from the queue
+    assert queue.status() == []
+    queue.release(second)
+
+
+def test_submit_joins_a_job_another_session_is_still_watching():
+    queue = SimulationQueue(max_running=1)
+    gate = threading.Event()
+    first = queue.submit("key", gated, gate)
+    second = queue.submit("key", gated, gate)
+    assert second is first
+    queue.release(first)
+    assert not first.cancelled.is_set()
+    gate.set()
+    assert second.result() == "done"
+    queue.release(second)
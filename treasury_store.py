@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import StringIO
+
+import pandas as pd
+
+import resilience
+from local_store import background_refresh_active, cache_path, file_lock, oldest_refresh, read_frame, write_frame
+
+# The daily par yield curve CSVs on home.treasury.gov start in 1990
+FIRST_YEAR = 1990
+
+# The current year's file is re-downloaded once it is older than this
+CURRENT_YEAR_TTL = timedelta(hours=1)
+
+MAX_WORKERS = 8
+
+YIELD_COLUMNS = ['1 Mo', '2 Mo', '3 Mo', '6 Mo', '1 Yr', '2 Yr', '3 Yr', '5 Yr',
+                 '7 Yr', '10 Yr', '20 Yr', '30 Yr']
+
+
+def _year_url(year):
+    return f'https://home.treasury.gov/resource-center/data-chart-center/interest-rates/daily-treasury-rates.csv/{year}/all?type=daily_treasury_yield_curve&field_tdr_date_value={year}page&_format=csv'
+
+
+def _download_year(year):
+    # Downloaded with requests rather than pd.read_csv(url) so it gets a timeout and retries
+    data = pd.read_csv(StringIO(resilience.get("treasury", _year_url(year)).text))
+    data['Date'] = pd.to_datetime(data['Date'])
+    # Older years lack some maturities (2 Mo before 2018, 30 Yr in 2002-2006)
+    return data.reindex(columns=['Date'] + YIELD_COLUMNS)
+
+
+def _load_year(year, max_age, offline=False):
+    """Return one year of yields and its metadata; closed years are downloaded once and never again."""
+    path = cache_path("treasury", f"{year}.parquet")
+    if offline:
+        # Files are swapped in atomically, so offline reads need no lock
+        return read_frame(path)
+    with file_lock(path):
+        stored, meta = read_frame(path)
+        if stored is not None:
+            if meta.get("closed") or max_age is None:
+                return stored, meta
+            if time.time() - meta.get("refreshed_at", 0) < max_age.total_seconds():
+                return stored, meta
+        try:
+            data = _download_year(year)
+        except Exception as err:
+            print(f"Failed to download Treasury yields for {year}: {err}")
+            return stored, meta
+        # A year is closed once it is over at download time; the copy taken
+        # while it was still running is refreshed one last time after new year
+        meta = {"closed": year < datetime.now().year, "refreshed_at": time.time()}
+        write_frame(data, path, meta)
+        return data, meta
+
+
+def load_yield_curve(years, max_age=CURRENT_YEAR_TTL, offline=False):
+    """Return daily yields for the given years indexed by Date, newest first.
+
+    offline=True returns the stored years as they are, without waiting on a
+    download in progress. attrs["refreshed_at"] is the time the open (current)
+    year was last downloaded.
+    """
+    # While the prefetch scheduler is running it owns refreshes of the current year
+    if background_refresh_active() and max_age == CURRENT_YEAR_TTL:
+        max_age = None
+    years = sorted(set(years), reverse=True)
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(years))) as executor:
+        loaded = list(executor.map(_load_year, years, [max_age] * len(years), [offline] * len(years)))
+    frames = [frame for frame, meta in loaded if frame is not None]
+    if not frames:
+        return pd.DataFrame(columns=YIELD_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+    data = pd.concat(frames, ignore_index=True).sort_values('Date', ascending=False)
+    data.index = data['Date']
+    data = data[YIELD_COLUMNS]
+    # Closed years never change, so only open years count towards the snapshot's age
+    data.attrs["refreshed_at"] = oldest_refresh(meta for frame, meta in loaded if not meta.get("closed"))
+    return data